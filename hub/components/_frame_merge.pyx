@@ -0,0 +1,24 @@
+# cython: language_level=3
+"""Cython build of components/frame_merge.py; keep the two in sync."""
+
+from time import time_ns
+
+
+cpdef bint merge_and_dispatch(object frame_bytes, bytes imu_blob, object ui_relay,
+                              object database_logger, object carrier_frame):
+    """Attach ``imu_blob`` to ``frame_bytes`` and pass it on (see frame_merge.py)."""
+    cdef bytes payload
+    
+    if frame_bytes is None:
+        if not imu_blob or ui_relay is None:
+            return False
+        carrier_frame.timestamp_us = time_ns() // 1000
+        ui_relay.push(carrier_frame.SerializeToString() + imu_blob)
+        return True
+    
+    payload = <bytes>frame_bytes + imu_blob if imu_blob else <bytes>frame_bytes
+    if ui_relay is not None:
+        ui_relay.push(payload)
+    if database_logger is not None:
+        database_logger.log_frame_bytes(payload)
+    return True
@@ -8,29 +8,263 @@ import sqlite3
 import json
 import time
 import threading
+import queue
+from functools import lru_cache
+from itertools import chain
 from typing import Optional, Dict, Any
 from datetime import datetime
+from urllib.request import pathname2url
 import os
 import sys
 
-# Add the api directory to the path for protobuf imports
-api_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'api', 'v1')
-sys.path.insert(0, api_path)
+import numpy as np
 
 try:
     import juggler_pb2
+    from google.protobuf.message import DecodeError
 except ImportError:
     print("❌ Error: Protocol Buffer files not found. Please run 'make generate-proto' first.")
     sys.exit(1)
 
+# zstd compression of packed frames is optional
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+
+# INSERT statements are module-level constants so the same string objects are
+# passed on every call and hit sqlite3's per-connection statement cache.
+_FRAME_INSERT_SQL = """
+    INSERT INTO frames (
+        session_id, frame_number, timestamp_us, frame_width, frame_height,
+        fps, camera_fx, camera_fy, camera_ppx, camera_ppy, depth_scale,
+        system_status
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+_BALL_INSERT_SQL = """
+    INSERT INTO balls (
+        session_id, frame_id, ball_id, color_name,
+        position_3d_x, position_3d_y, position_3d_z,
+        position_2d_x, position_2d_y,
+        velocity_3d_x, velocity_3d_y, velocity_3d_z,
+        radius_px, depth_m, confidence, is_held, timestamp_us,
+        color_bgr_b, color_bgr_g, color_bgr_r
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+_HAND_INSERT_SQL = """
+    INSERT INTO hands (
+        session_id, frame_id, side,
+        position_2d_x, position_2d_y,
+        position_3d_x, position_3d_y, position_3d_z,
+        confidence, is_visible
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+_IMU_INSERT_SQL = """
+    INSERT INTO imu_data (
+        session_id, frame_id, watch_name, watch_ip,
+        accel_x, accel_y, accel_z,
+        gyro_x, gyro_y, gyro_z,
+        mag_x, mag_y, mag_z,
+        accel_magnitude, gyro_magnitude,
+        timestamp_us, data_age_ms
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Multi-row "VALUES (...), (...)" variants of the child-table inserts, keyed by
+# row count. Rows are inserted in chunks of at most _BULK_MAX_ROWS, which keeps
+# the number of prepared variants small and stays under SQLite's 999
+# bound-parameter limit (20 columns x 16 rows = 320).
+_BULK_MAX_ROWS = 16
+
+
+def _build_bulk_sql(insert_sql: str, max_rows: int) -> Dict[int, str]:
+    head, row = insert_sql.rsplit("VALUES", 1)
+    row = row.strip()
+    return {n: f"{head}VALUES {', '.join([row] * n)}" for n in range(1, max_rows + 1)}
+
+
+_BALL_BULK_SQL = _build_bulk_sql(_BALL_INSERT_SQL, _BULK_MAX_ROWS)
+_HAND_BULK_SQL = _build_bulk_sql(_HAND_INSERT_SQL, _BULK_MAX_ROWS)
+_IMU_BULK_SQL = _build_bulk_sql(_IMU_INSERT_SQL, _BULK_MAX_ROWS)
+
+
+def _bulk_insert(cursor: sqlite3.Cursor, bulk_sql: Dict[int, str], rows: list):
+    """Insert rows with one multi-row statement per _BULK_MAX_ROWS chunk."""
+    for start in range(0, len(rows), _BULK_MAX_ROWS):
+        chunk = rows[start:start + _BULK_MAX_ROWS]
+        cursor.execute(bulk_sql[len(chunk)], list(chain.from_iterable(chunk)))
+
+
+def _with_magnitudes(imu_rows: list) -> list:
+    """Fill in the accel/gyro magnitudes of rows queued without them, in one NumPy pass.
+    
+    ``log_imu_raw`` rows carry NULL magnitudes; rows from ``log_imu_sample``
+    already have them and are passed through unchanged.
+    """
+    # Columns 4-9 are accel x/y/z and gyro x/y/z; 13 and 14 are the magnitudes
+    missing = [i for i, row in enumerate(imu_rows) if row[13] is None]
+    if not missing:
+        return imu_rows
+    n = len(missing)
+    vec = np.fromiter(chain.from_iterable(imu_rows[i][4:10] for i in missing),
+                      dtype=np.float64, count=6 * n).reshape(n, 6)
+    vec *= vec
+    accel_mag = np.sqrt(vec[:, 0:3].sum(axis=1)).tolist()
+    gyro_mag = np.sqrt(vec[:, 3:6].sum(axis=1)).tolist()
+    rows = list(imu_rows)
+    for i, a, g in zip(missing, accel_mag, gyro_mag):
+        row = rows[i]
+        rows[i] = row[:13] + (a, g) + row[15:]
+    return rows
+
+
+# Analysis indexes on the child tables. With ``sessions_dir`` they are dropped
+# from the per-session file while it is recorded so live inserts don't have to
+# maintain them, and built when the session ends. The shared database always
+# keeps them. The frames index stays since it is cheap and always useful.
+_ANALYSIS_INDEXES = (
+    ("idx_balls_session_frame", "balls (session_id, frame_id)"),
+    ("idx_balls_color_time", "balls (color_name, timestamp_us)"),
+    ("idx_hands_session_frame", "hands (session_id, frame_id)"),
+    ("idx_imu_session_time", "imu_data (session_id, timestamp_us)"),
+)
+
+_PACKED_INSERT_SQL = """
+    INSERT INTO frames_packed (
+        session_id, frame_number, timestamp_us, compressed, payload
+    ) VALUES (?, ?, ?, ?, ?)
+"""
+
+
+# Row expressions for one ball/hand, used by _child_row_builder. ``{i}`` is the
+# index into the frame's repeated field; color_name is no longer sent, so it
+# is stored as an empty string.
+_BALL_ROW_SRC = """\
+    b = balls[{i}]; p3 = b.position_3d; p2 = b.position_2d; v3 = b.velocity_3d; c = b.color_bgr
+    ball_rows.append((session_id, frame_id, b.track_id, "",
+                      p3.x, p3.y, p3.z, p2.x, p2.y, v3.x, v3.y, v3.z,
+                      b.radius_px, b.depth_m, b.confidence, b.is_held,
+                      b.timestamp_us, c.b, c.g, c.r))
+"""
+_HAND_ROW_SRC = """\
+    h = hands[{i}]; p2 = h.position_2d; p3 = h.position_3d
+    hand_rows.append((session_id, frame_id, h.side,
+                      p2.x, p2.y, p3.x, p3.y, p3.z, h.confidence, h.is_visible))
+"""
+
+
+@lru_cache(maxsize=64)
+def _child_row_builder(n_balls: int, n_hands: int):
+    """Compile a function that appends the ball/hand rows of a frame with
+    exactly ``n_balls`` balls and ``n_hands`` hands, with the loops unrolled."""
+    src = ("def build(session_id, frame_id, balls, hands, ball_rows, hand_rows):\n"
+           + "".join(_BALL_ROW_SRC.format(i=i) for i in range(n_balls))
+           + "".join(_HAND_ROW_SRC.format(i=i) for i in range(n_hands))
+           + "    pass\n")
+    namespace: Dict[str, Any] = {}
+    exec(compile(src, f"<child_rows_{n_balls}_{n_hands}>", "exec"), namespace)
+    return namespace["build"]
+
+
+# BEGIN IMMEDIATE / COMMIT attempts when another process holds the write lock.
+# Each attempt already waits up to busy_timeout inside SQLite.
+_LOCK_RETRIES = 3
+_LOCK_RETRY_DELAY_S = 0.05
+
+# Longest the idle writer thread waits on the queue before checking for a stop
+_WRITER_POLL_S = 0.1
+
+
+# Tag for queued IMU samples; everything else on the queue is a frame
+_IMU_SAMPLE = object()
+
+
+def _ro_uri(path: str) -> str:
+    """SQLite URI that opens ``path`` read-only."""
+    return f"file:{pathname2url(os.path.abspath(path))}?mode=ro"
+
+
+def _check_alias(alias: str):
+    """Reject schema aliases that can't be spliced into ATTACH/DETACH SQL."""
+    if not alias.isidentifier():
+        raise ValueError(f"Invalid database alias: {alias!r}")
+
 
 class DatabaseLogger:
-    """Database logger for juggling session data."""
+    """Database logger for juggling session data.
+    
+    ``log_frame_data`` only serializes the frame and queues it; a dedicated
+    writer thread drains the queue and inserts frames in batched transactions.
     
-    def __init__(self, db_path: str = "juggling_data.db"):
+    With ``packed=True`` each frame is stored as one row holding the serialized
+    (optionally zstd-compressed) FrameData instead of being split into the
+    frames/balls/hands/imu_data tables; ``expand_packed_frames`` converts those
+    rows into the normalized tables offline. Packed mode decodes each frame
+    only to read its frame_number and timestamp_us keys, so only
+    ``frames_logged`` is counted in that mode; malformed frames are skipped.
+    
+    With ``sessions_dir`` set, each session's data goes to its own
+    ``<sessions_dir>/<session_id>.db`` file and ``db_path`` only keeps the
+    ``sessions`` index; use ``attach_session`` to query a session's tables.
+    """
+    
+    def __init__(self, db_path: str = "juggling_data.db",
+                 commit_every_frames: int = 30, commit_interval_s: float = 0.1,
+                 synchronous: str = "NORMAL", cache_kib: int = 65536,
+                 mmap_bytes: int = 256 << 20,
+                 queue_size: int = 1024, write_batch_size: int = 32,
+                 packed: bool = False, compress: bool = True,
+                 sessions_dir: Optional[str] = None):
         self.db_path = db_path
+        # Write connection for session data; in per-session mode it is rebound
+        # to the session's own file and _meta_conn keeps pointing at db_path
         self.connection: Optional[sqlite3.Connection] = None
-        self.lock = threading.Lock()
+        self._meta_conn: Optional[sqlite3.Connection] = None
+        self.sessions_dir = sessions_dir
+        self._open_session_id: Optional[str] = None  # Session whose file self.connection is
+        # Separate read-only connection: WAL lets readers run alongside the writer.
+        # Not opened for ":memory:", which only its own connection can see.
+        self._ro_conn: Optional[sqlite3.Connection] = None
+        self._ro_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        # Serializes session start/end; re-entrant so _ensure_session can start one
+        self._session_lock = threading.RLock()
+        
+        # Frames are committed in batches: whichever threshold is hit first
+        self.commit_every_frames = commit_every_frames
+        self.commit_interval_s = commit_interval_s
+        self._uncommitted_frames = 0
+        self._last_commit_time = time.monotonic()
+        
+        # Writer thread: the caller only enqueues, the writer does all inserts
+        self.write_batch_size = write_batch_size
+        self._write_q: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._writer: Optional[threading.Thread] = None
+        # An Event rather than a queued sentinel: a full queue can neither block
+        # the stop request nor drop it
+        self._stop_writer = threading.Event()
+        self._rx_frame = juggler_pb2.FrameData()  # Parse buffer, writer thread only
+        self.frames_dropped = 0
+        self.imu_samples_dropped = 0
+        
+        # Last serialized system_status, reused while the status fields are unchanged
+        self._last_status_key = None
+        self._last_status_json: Optional[str] = None
+        
+        # Packed storage: one BLOB row per frame on the hot path
+        self.packed = packed
+        self.compress = compress and ZSTD_AVAILABLE
+        self._compressor = zstandard.ZstdCompressor(level=3) if self.compress else None
+        
+        # SQLite tuning (see _initialize_database)
+        self.synchronous = synchronous
+        self.cache_kib = cache_kib
+        self.mmap_bytes = mmap_bytes
         
         # Session tracking
         self.current_session_id: Optional[str] = None
@@ -48,18 +282,60 @@ class DatabaseLogger:
     def _initialize_database(self):
         """Initialize the SQLite database with required tables."""
         try:
-            self.connection = sqlite3.connect(self.db_path, check_same_thread=False)
-            self.connection.execute("PRAGMA journal_mode=WAL")  # Better concurrency
+            self.connection = self._connect(self.db_path)
+            self._meta_conn = self.connection
             
             # Create tables
             self._create_tables()
             
+            if self.db_path != ":memory:":
+                self._ro_conn = sqlite3.connect(_ro_uri(self.db_path), uri=True,
+                                                check_same_thread=False)
+            
+            self._writer = threading.Thread(target=self._writer_loop, daemon=True)
+            self._writer.start()
+            
             print(f"📊 Database initialized: {self.db_path}")
             
         except Exception as e:
             print(f"❌ Error initializing database: {e}")
             raise
     
+    def _connect(self, path: str) -> sqlite3.Connection:
+        """Open a write connection with the logger's pragmas applied."""
+        # isolation_level=None: transactions are managed explicitly with BEGIN/COMMIT
+        connection = sqlite3.connect(path, check_same_thread=False,
+                                     cached_statements=256, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")  # Better concurrency
+        # With WAL, synchronous=NORMAL only fsyncs at checkpoints: a power loss
+        # can drop the last transaction(s) but never corrupts the database.
+        connection.execute(f"PRAGMA synchronous={self.synchronous}")
+        connection.execute("PRAGMA temp_store=MEMORY")
+        connection.execute(f"PRAGMA cache_size={-int(self.cache_kib)}")  # negative = KiB
+        connection.execute(f"PRAGMA mmap_size={int(self.mmap_bytes)}")
+        connection.execute("PRAGMA busy_timeout=5000")
+        return connection
+    
+    def session_db_path(self, session_id: str) -> str:
+        """Path of the per-session database file (only used with ``sessions_dir``)."""
+        return os.path.join(self.sessions_dir, f"{session_id}.db")
+    
+    def _open_session_db(self, session_id: str):
+        """Point the writer at a new per-session file. Caller must hold ``self._write_lock``."""
+        os.makedirs(self.sessions_dir, exist_ok=True)
+        self.connection = self._connect(self.session_db_path(session_id))
+        self._open_session_id = session_id
+        self._create_tables()
+    
+    def _close_session_db(self):
+        """Close the per-session file and fall back to the meta database. Caller must hold ``self._write_lock``."""
+        if self.connection is self._meta_conn:
+            return
+        self._commit()
+        self.connection.close()
+        self.connection = self._meta_conn
+        self._open_session_id = None
+    
     def _create_tables(self):
         """Create database tables."""
         cursor = self.connection.cursor()
@@ -151,7 +427,7 @@ class DatabaseLogger:
             CREATE TABLE IF NOT EXISTS imu_data (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 session_id TEXT NOT NULL,
-                frame_id INTEGER NOT NULL,
+                frame_id INTEGER,
                 watch_name TEXT NOT NULL,
                 watch_ip TEXT,
                 accel_x REAL NOT NULL,
@@ -172,167 +448,513 @@ class DatabaseLogger:
             )
         """)
         
+        # Packed frames table (one serialized FrameData per row)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS frames_packed (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL,
+                frame_number INTEGER NOT NULL,
+                timestamp_us INTEGER NOT NULL,
+                compressed BOOLEAN NOT NULL DEFAULT 0,
+                payload BLOB NOT NULL,
+                FOREIGN KEY (session_id) REFERENCES sessions (session_id)
+            )
+        """)
+        
         # Create indexes for better query performance
+        self._migrate_imu_frame_id(cursor)
+        
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_frames_session_timestamp ON frames (session_id, timestamp_us)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_balls_session_frame ON balls (session_id, frame_id)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_balls_color_time ON balls (color_name, timestamp_us)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_hands_session_frame ON hands (session_id, frame_id)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_imu_session_frame ON imu_data (session_id, frame_id)")
+        # Replaced by idx_imu_session_time; left in place it would slow every IMU insert
+        cursor.execute("DROP INDEX IF EXISTS idx_imu_session_frame")
+        if not self.sessions_dir:
+            # The shared database holds every past session, so its child-table
+            # indexes are kept; only per-session files are ingested index-free
+            for name, target in _ANALYSIS_INDEXES:
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
         
         self.connection.commit()
     
+    def _migrate_imu_frame_id(self, cursor: sqlite3.Cursor):
+        """Rebuild imu_data from older databases where frame_id was NOT NULL.
+        
+        IMU samples are logged as they arrive rather than per frame, so they
+        may not belong to any frame.
+        """
+        columns = {row[1]: row for row in cursor.execute("PRAGMA table_info(imu_data)")}
+        if not columns['frame_id'][3]:  # notnull flag
+            return
+        
+        print("🔧 Migrating imu_data table (frame_id becomes nullable)...")
+        create_sql = cursor.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'imu_data'"
+        ).fetchone()[0]
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            cursor.execute("ALTER TABLE imu_data RENAME TO imu_data_old")
+            cursor.execute(create_sql.replace("frame_id INTEGER NOT NULL", "frame_id INTEGER", 1))
+            cursor.execute("INSERT INTO imu_data SELECT * FROM imu_data_old")
+            cursor.execute("DROP TABLE imu_data_old")
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+    
+    def _drop_analysis_indexes(self):
+        """Drop child-table indexes for index-free ingest. Caller must hold ``self._write_lock``."""
+        if self.connection is self._meta_conn:
+            return
+        cursor = self.connection.cursor()
+        for name, _target in _ANALYSIS_INDEXES:
+            cursor.execute(f"DROP INDEX IF EXISTS {name}")
+    
+    def _build_analysis_indexes(self):
+        """(Re)build child-table indexes for post-session queries. Caller must hold ``self._write_lock``."""
+        if self.connection is self._meta_conn:
+            return
+        cursor = self.connection.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            for name, target in _ANALYSIS_INDEXES:
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+    
     def start_session(self, session_id: Optional[str] = None, notes: str = "") -> str:
-        """Start a new logging session."""
-        with self.lock:
-            if session_id is None:
-                session_id = f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-            
-            self.current_session_id = session_id
-            self.session_start_time = time.time()
-            
-            cursor = self.connection.cursor()
-            cursor.execute("""
-                INSERT INTO sessions (session_id, start_time, notes)
-                VALUES (?, ?, ?)
-            """, (session_id, self.session_start_time, notes))
-            self.connection.commit()
-            
-            # Reset statistics
-            self.frames_logged = 0
-            self.balls_logged = 0
-            self.hands_logged = 0
-            self.imu_data_logged = 0
+        """Start a new logging session, ending the current one first."""
+        with self._session_lock:
+            self._end_current_session()
             
-            print(f"📝 Started logging session: {session_id}")
-            return session_id
+            with self._write_lock:
+                if session_id is None:
+                    session_id = f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+                
+                self.session_start_time = time.time()
+                
+                cursor = self._meta_conn.cursor()
+                cursor.execute("""
+                    INSERT INTO sessions (session_id, start_time, notes)
+                    VALUES (?, ?, ?)
+                """, (session_id, self.session_start_time, notes))
+                self._commit()
+                
+                if self.sessions_dir:
+                    self._open_session_db(session_id)
+                    self._drop_analysis_indexes()
+                
+                # Reset statistics
+                self.frames_logged = 0
+                self.balls_logged = 0
+                self.hands_logged = 0
+                self.imu_data_logged = 0
+                
+                # Only tag new rows with the session once its file is open
+                self.current_session_id = session_id
+                
+                print(f"📝 Started logging session: {session_id}")
+                return session_id
     
     def end_session(self):
         """End the current logging session."""
-        with self.lock:
-            if self.current_session_id is None:
-                return
-            
+        with self._session_lock:
+            self._end_current_session()
+    
+    def _end_current_session(self):
+        """Flush and close the current session, if any. Caller must hold ``self._session_lock``."""
+        session_id = self.current_session_id
+        if session_id is None:
+            return
+        
+        # Stop tagging new rows with this session, then let queued ones land
+        self.current_session_id = None
+        self._drain_writes()
+        
+        with self._write_lock:
             end_time = time.time()
-            cursor = self.connection.cursor()
+            cursor = self._meta_conn.cursor()
             cursor.execute("""
                 UPDATE sessions 
                 SET end_time = ?, total_frames = ?, total_balls = ?
                 WHERE session_id = ?
-            """, (end_time, self.frames_logged, self.balls_logged, self.current_session_id))
-            self.connection.commit()
+            """, (end_time, self.frames_logged, self.balls_logged, session_id))
+            # Also flushes any frames still pending in the open transaction
+            self._commit()
+            
+            self._build_analysis_indexes()
+            self._close_session_db()
             
             duration = end_time - self.session_start_time if self.session_start_time else 0
-            print(f"📝 Ended logging session: {self.current_session_id}")
+            print(f"📝 Ended logging session: {session_id}")
             print(f"   Duration: {duration:.1f}s, Frames: {self.frames_logged}, Balls: {self.balls_logged}")
             
-            self.current_session_id = None
             self.session_start_time = None
     
     def log_frame_data(self, frame_data: juggler_pb2.FrameData):
-        """Log a complete frame of data."""
-        if self.current_session_id is None:
+        """Queue a complete frame of data for the writer thread (non-blocking)."""
+        # Serialize now so the caller is free to reuse or mutate frame_data
+        self.log_frame_bytes(frame_data.SerializeToString(),
+                             frame_data.frame_number, frame_data.timestamp_us)
+    
+    def log_frame_bytes(self, payload: bytes, frame_number: Optional[int] = None,
+                        timestamp_us: Optional[int] = None):
+        """Queue an already serialized FrameData for the writer thread.
+        
+        If frame_number/timestamp_us are not given, the writer thread reads
+        them from the payload, keeping the parse off the caller's thread.
+        """
+        # Read once: the session can end (and the id be cleared) at any time
+        session_id = self.current_session_id
+        if session_id is None:
             # Auto-start session if not already started
-            self.start_session()
+            session_id = self._ensure_session()
         
-        with self.lock:
+        self._enqueue((session_id, frame_number, timestamp_us, payload))
+    
+    def _enqueue(self, item: tuple):
+        """Hand an item to the writer thread without blocking."""
+        try:
+            self._write_q.put_nowait(item)
+        except queue.Full:
+            # Drop the oldest entry rather than stalling the receive path
             try:
-                cursor = self.connection.cursor()
-                
-                # Insert frame record
-                cursor.execute("""
-                    INSERT INTO frames (
-                        session_id, frame_number, timestamp_us, frame_width, frame_height,
-                        fps, camera_fx, camera_fy, camera_ppx, camera_ppy, depth_scale,
-                        system_status
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    self.current_session_id,
-                    frame_data.frame_number,
-                    frame_data.timestamp_us,
-                    frame_data.frame_width,
-                    frame_data.frame_height,
-                    frame_data.status.fps,
-                    frame_data.intrinsics.fx,
-                    frame_data.intrinsics.fy,
-                    frame_data.intrinsics.ppx,
-                    frame_data.intrinsics.ppy,
-                    frame_data.intrinsics.depth_scale,
-                    json.dumps({
-                        'camera_connected': frame_data.status.camera_connected,
-                        'engine_running': frame_data.status.engine_running,
-                        'mode': frame_data.status.mode,
-                        'error_message': frame_data.status.error_message
-                    })
-                ))
-                
-                frame_id = cursor.lastrowid
-                
-                # Insert ball data
-                for ball in frame_data.balls:
-                    cursor.execute("""
-                        INSERT INTO balls (
-                            session_id, frame_id, ball_id, color_name,
-                            position_3d_x, position_3d_y, position_3d_z,
-                            position_2d_x, position_2d_y,
-                            velocity_3d_x, velocity_3d_y, velocity_3d_z,
-                            radius_px, depth_m, confidence, is_held, timestamp_us,
-                            color_bgr_b, color_bgr_g, color_bgr_r
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        self.current_session_id, frame_id, ball.track_id, "", # color_name is removed, using empty string for placeholder
-                        ball.position_3d.x, ball.position_3d.y, ball.position_3d.z,
-                        ball.position_2d.x, ball.position_2d.y,
-                        ball.velocity_3d.x, ball.velocity_3d.y, ball.velocity_3d.z,
-                        ball.radius_px, ball.depth_m, ball.confidence, ball.is_held,
-                        ball.timestamp_us,
-                        ball.color_bgr.b, ball.color_bgr.g, ball.color_bgr.r
-                    ))
-                    self.balls_logged += 1
-                
-                # Insert hand data
-                for hand in frame_data.hands:
+                self._count_dropped(self._write_q.get_nowait())
+                self._write_q.task_done()
+            except queue.Empty:
+                pass
+            try:
+                self._write_q.put_nowait(item)
+            except queue.Full:
+                self._count_dropped(item)
+    
+    def _count_dropped(self, item: tuple):
+        """Count a queue entry that was discarded under its own statistic."""
+        if item[0] is _IMU_SAMPLE:
+            self.imu_samples_dropped += 1
+        else:
+            self.frames_dropped += 1
+    
+    def log_imu_sample(self, imu: juggler_pb2.IMUData):
+        """Queue one IMU sample as it arrives, independent of camera frames.
+        
+        Samples are stored with a NULL ``frame_id``; analysis joins them to
+        frames on the nearest ``timestamp_us``.
+        """
+        session_id = self.current_session_id
+        if session_id is None:
+            session_id = self._ensure_session()
+        
+        acc, gyro, mag = imu.acceleration, imu.gyroscope, imu.magnetometer
+        row = (
+            session_id, None, imu.watch_name, imu.watch_ip,
+            acc.x, acc.y, acc.z,
+            gyro.x, gyro.y, gyro.z,
+            mag.x, mag.y, mag.z,
+            imu.accel_magnitude, imu.gyro_magnitude,
+            imu.timestamp_us, imu.data_age_ms
+        )
+        self._enqueue((_IMU_SAMPLE, row))
+    
+    def log_imu_raw(self, watch_name: str, raw: tuple):
+        """Queue one IMU sample given as ``(ts_us, ax, ay, az, gx, gy, gz, ip)``.
+        
+        Same row layout as :meth:`log_imu_sample` without building a protobuf
+        message first; magnitudes are filled in by the writer, and fields the
+        watches don't send (magnetometer, data age) are stored as NULL.
+        """
+        session_id = self.current_session_id
+        if session_id is None:
+            session_id = self._ensure_session()
+        
+        ts_us, ax, ay, az, gx, gy, gz, ip = raw
+        row = (
+            session_id, None, watch_name, ip,
+            ax, ay, az,
+            gx, gy, gz,
+            None, None, None,
+            None, None,
+            ts_us, None
+        )
+        self._enqueue((_IMU_SAMPLE, row))
+    
+    def _ensure_session(self) -> str:
+        """Auto-start a session exactly once when frames and IMU samples race."""
+        with self._session_lock:
+            if self.current_session_id is None:
+                return self.start_session()
+            return self.current_session_id
+    
+    def _drain_writes(self):
+        """Block until the writer thread has processed everything queued so far."""
+        if self._writer is not None and self._writer.is_alive():
+            self._write_q.join()
+    
+    def _writer_loop(self):
+        """Drain queued frames and write them in batches (writer thread)."""
+        write_q = self._write_q
+        # Wake up regularly even with a long commit interval, so a stop is seen promptly
+        poll_s = min(self.commit_interval_s, _WRITER_POLL_S)
+        while not self._stop_writer.is_set():
+            try:
+                item = write_q.get(timeout=poll_s)
+            except queue.Empty:
+                # Idle: don't leave a partial batch uncommitted past the commit interval
+                if time.monotonic() - self._last_commit_time >= self.commit_interval_s:
+                    with self._write_lock:
+                        self._commit()
+                continue
+            
+            batch = [item]
+            while len(batch) < self.write_batch_size:
+                try:
+                    batch.append(write_q.get_nowait())
+                except queue.Empty:
+                    break
+            
+            frames = []
+            imu_rows = []
+            for entry in batch:
+                if entry[0] is _IMU_SAMPLE:
+                    imu_rows.append(entry[1])
+                else:
+                    frames.append(entry)
+            try:
+                if frames or imu_rows:
+                    with self._write_lock:
+                        self._write_batch(frames, imu_rows)
+            finally:
+                for _ in batch:
+                    write_q.task_done()
+    
+    def _write_batch(self, frames: list, imu_rows: list):
+        """Insert queued frames and IMU samples. Caller must hold ``self._write_lock``."""
+        if self.sessions_dir:
+            frames, imu_rows = self._rows_for_open_session(frames, imu_rows)
+            if not frames and not imu_rows:
+                return
+        try:
+            cursor = self.connection.cursor()
+            if not self.connection.in_transaction:
+                self._execute_with_lock_retry("BEGIN IMMEDIATE")
+            
+            # Commits are batched, so a failed insert only rolls back to this
+            # savepoint; frames from earlier batches stay in the transaction
+            cursor.execute("SAVEPOINT batch")
+            try:
+                if self.packed:
+                    n_frames = self._insert_packed(cursor, frames)
+                    balls = hands = 0
+                else:
+                    n_frames, balls, hands = self._insert_normalized(cursor, frames)
+                if imu_rows:
+                    _bulk_insert(cursor, _IMU_BULK_SQL, _with_magnitudes(imu_rows))
+            except Exception as e:
+                print(f"❌ Error logging frame data: {e}")
+                cursor.execute("ROLLBACK TO batch")
+                n_frames = balls = hands = 0
+                imu_rows = ()
+            cursor.execute("RELEASE batch")
+            
+            self.frames_logged += n_frames
+            self.balls_logged += balls
+            self.hands_logged += hands
+            self.imu_data_logged += len(imu_rows)
+            
+            # Commit in batches rather than once per frame
+            self._uncommitted_frames += n_frames
+            if (self._uncommitted_frames >= self.commit_every_frames or
+                    time.monotonic() - self._last_commit_time >= self.commit_interval_s):
+                self._commit()
+            
+        except Exception as e:
+            print(f"❌ Error committing frame data: {e}")
+            if self.connection.in_transaction:
+                self.connection.execute("ROLLBACK")
+            self._uncommitted_frames = 0
+    
+    def _rows_for_open_session(self, frames: list, imu_rows: list) -> tuple:
+        """Drop rows queued for a session whose file is no longer open.
+        
+        A producer can read ``current_session_id`` just before the session
+        ends and queue its row after the final drain; without this check the
+        row would land in the meta database or the next session's file.
+        Caller must hold ``self._write_lock``.
+        """
+        session_id = self._open_session_id
+        kept_frames = [f for f in frames if f[0] == session_id]
+        kept_imu = [r for r in imu_rows if r[0] == session_id]
+        self.frames_dropped += len(frames) - len(kept_frames)
+        self.imu_samples_dropped += len(imu_rows) - len(kept_imu)
+        return kept_frames, kept_imu
+    
+    def _insert_packed(self, cursor: sqlite3.Cursor, frames: list) -> int:
+        """Store each frame as a single ``frames_packed`` row. Returns the row count."""
+        compressor = self._compressor
+        header = self._rx_frame
+        rows = []
+        for session_id, frame_number, timestamp_us, payload in frames:
+            if frame_number is None:
+                # Queued unparsed by log_frame_bytes; read the row keys here
+                try:
+                    header.ParseFromString(payload)
+                except DecodeError as e:
+                    print(f"⚠️  Skipping malformed frame ({len(payload)} bytes): {e}")
+                    continue
+                frame_number, timestamp_us = header.frame_number, header.timestamp_us
+            if compressor is not None:
+                rows.append((session_id, frame_number, timestamp_us, True, compressor.compress(payload)))
+            else:
+                rows.append((session_id, frame_number, timestamp_us, False, payload))
+        cursor.executemany(_PACKED_INSERT_SQL, rows)
+        return len(rows)
+    
+    def _insert_normalized(self, cursor: sqlite3.Cursor, frames: list) -> tuple:
+        """Split frames into the frames/balls/hands/imu_data tables.
+        
+        IMU samples are logged separately (see ``log_imu_sample``), so any
+        ``imu_data`` carried on the frame is not stored again. Frames that
+        fail to parse are skipped.
+        Returns the number of (frame, ball, hand) rows inserted.
+        """
+        frame_data = self._rx_frame
+        ball_rows = []
+        hand_rows = []
+        n_frames = 0
+        
+        for session_id, _frame_number, _timestamp_us, payload in frames:
+            try:
+                frame_data.ParseFromString(payload)
+            except DecodeError as e:
+                print(f"⚠️  Skipping malformed frame ({len(payload)} bytes): {e}")
+                continue
+            
+            status = frame_data.status
+            status_key = (status.camera_connected, status.engine_running,
+                          status.mode, status.error_message)
+            if status_key != self._last_status_key:
+                self._last_status_key = status_key
+                self._last_status_json = json.dumps({
+                    'camera_connected': status.camera_connected,
+                    'engine_running': status.engine_running,
+                    'mode': status.mode,
+                    'error_message': status.error_message
+                })
+            
+            # Insert frame record
+            intrinsics = frame_data.intrinsics
+            cursor.execute(_FRAME_INSERT_SQL, (
+                session_id,
+                frame_data.frame_number,
+                frame_data.timestamp_us,
+                frame_data.frame_width,
+                frame_data.frame_height,
+                status.fps,
+                intrinsics.fx,
+                intrinsics.fy,
+                intrinsics.ppx,
+                intrinsics.ppy,
+                intrinsics.depth_scale,
+                self._last_status_json
+            ))
+            
+            frame_id = cursor.lastrowid
+            
+            # Collect child rows for the whole batch, inserted once per table below.
+            # The builder is specialised per (balls, hands) count and cached.
+            balls, hands = frame_data.balls, frame_data.hands
+            _child_row_builder(len(balls), len(hands))(
+                session_id, frame_id, balls, hands, ball_rows, hand_rows)
+            n_frames += 1
+        
+        _bulk_insert(cursor, _BALL_BULK_SQL, ball_rows)
+        _bulk_insert(cursor, _HAND_BULK_SQL, hand_rows)
+        
+        return n_frames, len(ball_rows), len(hand_rows)
+    
+    def expand_packed_frames(self, session_id: Optional[str] = None, chunk_size: int = 1000) -> int:
+        """Move ``frames_packed`` rows into the normalized tables.
+        
+        Each chunk is expanded and deleted from ``frames_packed`` in one
+        transaction, so the migration can be interrupted and resumed.
+        IMU data embedded in the frames is dropped: samples are logged to
+        ``imu_data`` on their own as they arrive, so it would only duplicate them.
+        Only works on ``db_path``, not on per-session files from ``sessions_dir``.
+        Returns the number of frames expanded.
+        """
+        if self.sessions_dir:
+            raise ValueError("expand_packed_frames does not support per-session databases (sessions_dir)")
+        self._drain_writes()
+        decompressor = zstandard.ZstdDecompressor() if ZSTD_AVAILABLE else None
+        expanded = 0
+        
+        with self._write_lock:
+            cursor = self.connection.cursor()
+            if self.connection.in_transaction:
+                self._commit()
+            
+            while True:
+                if session_id is None:
                     cursor.execute("""
-                        INSERT INTO hands (
-                            session_id, frame_id, side,
-                            position_2d_x, position_2d_y,
-                            position_3d_x, position_3d_y, position_3d_z,
-                            confidence, is_visible
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        self.current_session_id, frame_id, hand.side,
-                        hand.position_2d.x, hand.position_2d.y,
-                        hand.position_3d.x, hand.position_3d.y, hand.position_3d.z,
-                        hand.confidence, hand.is_visible
-                    ))
-                    self.hands_logged += 1
-                
-                # Insert IMU data
-                for imu in frame_data.imu_data:
+                        SELECT id, session_id, compressed, payload FROM frames_packed
+                        ORDER BY id LIMIT ?
+                    """, (chunk_size,))
+                else:
                     cursor.execute("""
-                        INSERT INTO imu_data (
-                            session_id, frame_id, watch_name, watch_ip,
-                            accel_x, accel_y, accel_z,
-                            gyro_x, gyro_y, gyro_z,
-                            mag_x, mag_y, mag_z,
-                            accel_magnitude, gyro_magnitude,
-                            timestamp_us, data_age_ms
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        self.current_session_id, frame_id, imu.watch_name, imu.watch_ip,
-                        imu.acceleration.x, imu.acceleration.y, imu.acceleration.z,
-                        imu.gyroscope.x, imu.gyroscope.y, imu.gyroscope.z,
-                        imu.magnetometer.x, imu.magnetometer.y, imu.magnetometer.z,
-                        imu.accel_magnitude, imu.gyro_magnitude,
-                        imu.timestamp_us, imu.data_age_ms
-                    ))
-                    self.imu_data_logged += 1
+                        SELECT id, session_id, compressed, payload FROM frames_packed
+                        WHERE session_id = ? ORDER BY id LIMIT ?
+                    """, (session_id, chunk_size))
+                rows = cursor.fetchall()
+                if not rows:
+                    break
                 
-                self.connection.commit()
-                self.frames_logged += 1
+                frames = []
+                for _row_id, row_session, compressed, payload in rows:
+                    if compressed:
+                        if decompressor is None:
+                            raise RuntimeError("zstandard is required to expand compressed frames")
+                        payload = decompressor.decompress(payload)
+                    frames.append((row_session, None, None, payload))
                 
-            except Exception as e:
-                print(f"❌ Error logging frame data: {e}")
-                self.connection.rollback()
+                cursor.execute("BEGIN IMMEDIATE")
+                try:
+                    self._insert_normalized(cursor, frames)
+                    cursor.executemany("DELETE FROM frames_packed WHERE id = ?",
+                                       [(row[0],) for row in rows])
+                    cursor.execute("COMMIT")
+                except Exception:
+                    cursor.execute("ROLLBACK")
+                    raise
+                expanded += len(rows)
+        
+        print(f"📦 Expanded {expanded} packed frames")
+        return expanded
+    
+    def _commit(self):
+        """Commit any pending frames. Caller must hold ``self._write_lock``."""
+        if self.connection.in_transaction:
+            self._execute_with_lock_retry("COMMIT")
+        self._uncommitted_frames = 0
+        self._last_commit_time = time.monotonic()
+    
+    def _execute_with_lock_retry(self, sql: str):
+        """Run a transaction statement, backing off while the database is locked.
+        
+        Only BEGIN IMMEDIATE and COMMIT can hit SQLITE_BUSY here: once the
+        write lock is held, inserts cannot. A busy COMMIT leaves the
+        transaction open, so retrying it loses nothing.
+        """
+        delay = _LOCK_RETRY_DELAY_S
+        for attempt in range(_LOCK_RETRIES):
+            try:
+                self.connection.execute(sql)
+                return
+            except sqlite3.OperationalError as e:
+                if "locked" not in str(e) or attempt == _LOCK_RETRIES - 1:
+                    raise
+                print(f"⚠️  Database is locked, retrying {sql} in {delay:.2f}s...")
+                time.sleep(delay)
+                delay *= 2
     
     def get_statistics(self) -> Dict[str, Any]:
         """Get current logging statistics."""
@@ -343,19 +965,39 @@ class DatabaseLogger:
             'balls_logged': self.balls_logged,
             'hands_logged': self.hands_logged,
             'imu_data_logged': self.imu_data_logged,
+            'frames_dropped': self.frames_dropped,
+            'imu_samples_dropped': self.imu_samples_dropped,
+            'queue_depth': self._write_q.qsize(),
             'db_path': self.db_path
         }
     
     def get_sessions(self) -> list:
         """Get list of all sessions."""
-        with self.lock:
-            cursor = self.connection.cursor()
-            cursor.execute("""
-                SELECT session_id, start_time, end_time, total_frames, total_balls, notes
-                FROM sessions
-                ORDER BY start_time DESC
-            """)
-            return cursor.fetchall()
+        sql = """
+            SELECT session_id, start_time, end_time, total_frames, total_balls, notes
+            FROM sessions
+            ORDER BY start_time DESC
+        """
+        if self._ro_conn is None:
+            # In-memory database: read through the write connection
+            with self._write_lock:
+                return self._meta_conn.execute(sql).fetchall()
+        with self._ro_lock:
+            return self._ro_conn.execute(sql).fetchall()
+    
+    def attach_session(self, session_id: str, alias: str = "s") -> sqlite3.Connection:
+        """Open a query connection with a per-session database ATTACHed read-only.
+        
+        The connection is the caller's own and should be closed when done, e.g.
+        ``attach_session(sid).execute("SELECT * FROM s.balls")``.
+        """
+        _check_alias(alias)
+        if self.db_path == ":memory:":
+            connection = sqlite3.connect(":memory:")
+        else:
+            connection = sqlite3.connect(_ro_uri(self.db_path), uri=True)
+        connection.execute(f"ATTACH DATABASE ? AS {alias}", (_ro_uri(self.session_db_path(session_id)),))
+        return connection
     
     def cleanup(self):
         """Clean up database resources."""
@@ -365,11 +1007,23 @@ class DatabaseLogger:
         if self.current_session_id:
             self.end_session()
         
+        # Stop the writer thread (end_session has already drained the queue)
+        if self._writer and self._writer.is_alive():
+            self._stop_writer.set()
+            self._writer.join(timeout=5.0)
+        self._writer = None
+        
         # Close database connection
         if self.connection:
+            with self._write_lock:
+                self._commit()
             self.connection.close()
             self.connection = None
         
+        if self._ro_conn:
+            self._ro_conn.close()
+            self._ro_conn = None
+        
         print("✅ Database logger cleanup completed")
     
     def __del__(self):
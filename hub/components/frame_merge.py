@@ -0,0 +1,38 @@
+"""
+Frame Merge
+
+Per-frame glue of the hub's data loop: append the latest IMU readings, as
+pre-serialized bytes, to the engine's serialized frame and hand the result
+to the UI relay and database logger. The frame itself is never parsed here.
+``_frame_merge.pyx`` is a Cython build of the same function; main.py uses it
+when it has been compiled (``python setup.py build_ext --inplace`` in hub/).
+"""
+
+import time
+
+
+def merge_and_dispatch(frame_bytes, imu_blob, ui_relay, database_logger, carrier_frame) -> bool:
+    """Attach ``imu_blob`` to ``frame_bytes`` and pass the result on.
+    
+    ``imu_blob`` is a serialized FrameData holding only imu_data (see
+    ``IMUListener.get_latest_data_blob``); serialized messages merge when
+    concatenated, so appending it attaches the IMU entries. The engine never
+    fills imu_data itself. ``frame_bytes`` is the raw frame from the engine or
+    None; when it is None but IMU data is available, ``carrier_frame`` is
+    stamped with the current time and serialized to carry it to the UI.
+    Only engine frames are logged, since IMU samples are logged on arrival.
+    Returns whether a frame was dispatched.
+    """
+    if frame_bytes is None:
+        if not imu_blob or ui_relay is None:
+            return False
+        carrier_frame.timestamp_us = time.time_ns() // 1000
+        ui_relay.push(carrier_frame.SerializeToString() + imu_blob)
+        return True
+    
+    payload = frame_bytes + imu_blob if imu_blob else frame_bytes
+    if ui_relay is not None:
+        ui_relay.push(payload)
+    if database_logger is not None:
+        database_logger.log_frame_bytes(payload)
+    return True
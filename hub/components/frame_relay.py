@@ -0,0 +1,75 @@
+"""
+Frame Relay
+
+Moves UI updates off the hub's data loop. The loop pushes each frame as
+serialized bytes; a consumer thread parses them into its own FrameData and
+calls the UI, so a slow repaint or console write never delays the next
+ZMQ receive. Frames that pile up while the UI is busy are dropped, and only
+the newest one is shown.
+"""
+
+import collections
+import threading
+from typing import Optional
+
+import juggler_pb2
+
+
+class FrameRelay:
+    """Single-producer/single-consumer handoff of serialized frames to a UI."""
+
+    def __init__(self, target, maxlen: int = 256):
+        self.target = target
+        # deque append/popleft are atomic, so the producer never takes a lock;
+        # when full, the oldest frame is discarded
+        self._ring: collections.deque = collections.deque(maxlen=maxlen)
+        self._ready = threading.Event()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+        # Owned by the consumer thread, never shared with the producer
+        self._frame = juggler_pb2.FrameData()
+        self.frames_pushed = 0  # Every frame the data loop handed over
+        self.frames_dropped = 0  # Skipped as stale, never shown
+
+    def start(self):
+        """Start the consumer thread."""
+        self._running = True
+        self._thread = threading.Thread(target=self._consume_loop, daemon=True)
+        self._thread.start()
+
+    def push(self, payload: bytes):
+        """Queue one serialized frame (called from the data loop)."""
+        ring = self._ring
+        self.frames_pushed += 1
+        if len(ring) == ring.maxlen:
+            self.frames_dropped += 1
+        ring.append(payload)
+        self._ready.set()
+
+    def _consume_loop(self):
+        """Parse the latest queued frame and pass it to the target (consumer thread)."""
+        ring, ready, frame = self._ring, self._ready, self._frame
+        update = self.target.update_frame_data
+        while self._running:
+            if not ready.wait(timeout=0.1):
+                continue
+            ready.clear()
+            # Only the newest frame is shown; skip any backlog from a UI stall
+            stale = len(ring) - 1
+            if stale < 0:
+                continue
+            for _ in range(stale):
+                ring.popleft()
+            self.frames_dropped += stale
+            try:
+                frame.ParseFromString(ring.popleft())
+                update(frame)
+            except Exception as e:
+                print(f"❌ Error updating UI from frame relay: {e}")
+
+    def stop(self):
+        """Stop the consumer thread."""
+        self._running = False
+        self._ready.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=1.0)
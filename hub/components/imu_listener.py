@@ -1,25 +1,87 @@
 import asyncio
+import functools
 import websockets
 import json
+import random
 import threading
 import time
-from typing import Dict, Optional, List
+from typing import Dict, Optional, List, Tuple, Union, TYPE_CHECKING
+
+import msgspec
 
 import juggler_pb2
 
+if TYPE_CHECKING:
+    from .database_logger import DatabaseLogger
+
+class ImuMsg(msgspec.Struct):
+    """One accel or gyro sample as sent by the watch."""
+    type: str
+    x: float
+    y: float
+    z: float
+    # Some watches send whole nanoseconds as a float (e.g. 1.7e18); msgspec won't coerce it
+    timestamp_ns: Union[int, float]
+    watch_id: str = ""
+
+
+# Decodes straight into ImuMsg without building an intermediate dict.
+# A JSON array carries several samples in one frame (batched simulator).
+_DECODER = msgspec.json.Decoder(Union[ImuMsg, List[ImuMsg]])
+# Same schema for binary MessagePack frames (imu_simulator.py --msgpack)
+_MSGPACK_DECODER = msgspec.msgpack.Decoder(Union[ImuMsg, List[ImuMsg]])
+
+# recv(decode=False) hands back bytes for text frames too, so JSON is told
+# apart from MessagePack by its first byte
+_JSON_FIRST_BYTES = frozenset(b'{[ \t\r\n')
+
+# Reconnect backoff: doubles per failed attempt, plus up to 1s of jitter
+_BACKOFF_INITIAL_S = 1.0
+_BACKOFF_MAX_S = 30.0
+
+
+class WatchState:
+    """Latest accel/gyro reading for one watch connection, updated in place."""
+    __slots__ = ('watch_ip', 'watch_name', 'ax', 'ay', 'az', 'gx', 'gy', 'gz',
+                 'timestamp_us', 'have_accel', 'have_gyro', 'new_accel', 'new_gyro')
+
+    def __init__(self, watch_ip: str):
+        self.watch_ip = watch_ip
+        self.watch_name = watch_ip
+        self.ax = self.ay = self.az = 0.0
+        self.gx = self.gy = self.gz = 0.0
+        self.timestamp_us = 0
+        self.have_accel = self.have_gyro = False
+        # Set on arrival, cleared once the pair has been logged
+        self.new_accel = self.new_gyro = False
+
+
 class IMUListener:
     """
     Connects to and streams IMU data from smartwatches over WebSockets.
     Based on the high-performance implementation from the JugVid2 project.
     """
-    def __init__(self, watch_ips: List[str], port: int = 8081):
+    def __init__(self, watch_ips: List[str], port: int = 8081,
+                 database_logger: Optional["DatabaseLogger"] = None):
         self.watch_ips = watch_ips
         self.port = port
+        # Samples are logged as they arrive rather than once per camera frame
+        self.database_logger = database_logger
         self.running = False
-        self._data_lock = threading.Lock()
-        self._latest_data: Dict[str, juggler_pb2.IMUData] = {}
-        # This state will hold the latest sensor readings for each watch.
-        self._watch_states: Dict[str, dict] = {}
+        # Latest (ts_us, ax, ay, az, gx, gy, gz, ip) per watch; IMUData is built on demand.
+        # The event loop owns _latest_raw and publishes an immutable copy in
+        # _latest_snapshot, which readers pick up without locking.
+        self._latest_raw: Dict[str, Tuple] = {}
+        self._latest_snapshot: Tuple[Tuple[str, Tuple], ...] = ()
+        self._pb_cache: Dict[str, Tuple[Tuple, juggler_pb2.IMUData]] = {}
+        # Serialized imu_data field for the snapshot in _blob_key (see get_latest_data_blob)
+        self._blob_key: Optional[Tuple] = None
+        self._blob = b""
+        self._blob_frame = juggler_pb2.FrameData()
+        # Latest sensor readings per watch IP; only touched by the event loop thread.
+        self._watch_states: Dict[str, WatchState] = {}
+        # Watches whose payloads failed schema validation, reported once each
+        self._invalid_reported: set = set()
         self._thread: Optional[threading.Thread] = None
 
     def start(self):
@@ -29,6 +91,7 @@ class IMUListener:
             return
 
         print(f"🚀 Starting high-performance IMU listener for IPs: {self.watch_ips}...")
+        self._watch_states = {ip: WatchState(ip) for ip in self.watch_ips}
         self.running = True
         self._thread = threading.Thread(target=self._run_event_loop, daemon=True)
         self._thread.start()
@@ -50,8 +113,12 @@ class IMUListener:
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
         try:
-            tasks = [self._stream_from_watch(ip) for ip in self.watch_ips]
-            loop.run_until_complete(asyncio.gather(*tasks))
+            tasks = [loop.create_task(self._stream_from_watch(ip)) for ip in self.watch_ips]
+            # A watch task that dies must not cancel the others
+            results = loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            for ip, result in zip(self.watch_ips, results):
+                if isinstance(result, BaseException):
+                    print(f"❌ IMU stream for {ip} stopped: {result}")
         except Exception as e:
             print(f"❌ Error in IMU listener event loop: {e}")
         finally:
@@ -60,6 +127,7 @@ class IMUListener:
     async def _stream_from_watch(self, ip: str):
         """Manages the WebSocket connection and data stream for a single watch."""
         uri = f"ws://{ip}:{self.port}/imu"
+        delay = _BACKOFF_INITIAL_S
         while self.running:
             try:
                 async with websockets.connect(uri, ping_interval=None, ping_timeout=None) as websocket:
@@ -67,9 +135,19 @@ class IMUListener:
                     await websocket.send(json.dumps({"command": "start"}))
                     print(f"▶️ Sent 'start' command to {ip}")
                     
+                    # Ask for raw frame bytes so text frames skip the UTF-8 decode;
+                    # websockets < 13 has no decode flag and hands back str
+                    try:
+                        recv = functools.partial(websocket.recv, decode=False)
+                        message = await recv()
+                    except TypeError:
+                        recv = websocket.recv
+                        message = await recv()
+                    delay = _BACKOFF_INITIAL_S
+                    
                     while self.running:
-                        message = await websocket.recv()
                         self._process_message(message, ip)
+                        message = await recv()
                 
                 # This part is now outside the 'with' block, so it's reached on graceful exit
                 if 'websocket' in locals() and websocket.open:
@@ -78,61 +156,132 @@ class IMUListener:
 
             except (websockets.exceptions.ConnectionClosed, ConnectionRefusedError, OSError) as e:
                 if self.running:
-                    print(f"⚠️  Connection to {ip} lost, retrying in 2s... ({e})")
-                    await asyncio.sleep(2)
+                    print(f"⚠️  Connection to {ip} lost, retrying in {delay:.0f}s... ({e})")
+                    await asyncio.sleep(delay + random.random())
+                    delay = min(delay * 2, _BACKOFF_MAX_S)
             except Exception as e:
                  if self.running:
                     print(f"❌ Unexpected error with watch {ip}: {e}")
-                    await asyncio.sleep(2)
+                    await asyncio.sleep(delay + random.random())
+                    delay = min(delay * 2, _BACKOFF_MAX_S)
 
-    def _process_message(self, message: str, ip: str):
+    def _process_message(self, message: Union[bytes, str], ip: str):
         """
-        Robustly parses a JSON message and updates the IMU data.
+        Robustly parses a JSON or MessagePack message and updates the IMU data.
         This new logic maintains the latest state for each sensor and combines them.
+        Accepts bytes or str; msgspec reads either buffer in place.
         """
+        if not message:
+            return
         try:
-            raw_data = json.loads(message)
-            watch_name = raw_data.get('watch_id', ip)
-            data_type = raw_data.get('type')
-
-            if not all([watch_name, data_type]):
-                return
-
-            # Get or create the state for this watch
-            state = self._watch_states.get(watch_name, {})
-            state['watch_ip'] = ip
-
-            # Update the state with the new data
-            if data_type == 'accel':
-                state['accel'] = (raw_data['x'], raw_data['y'], raw_data['z'])
-                state['timestamp_us'] = raw_data['timestamp_ns'] // 1000
-            elif data_type == 'gyro':
-                state['gyro'] = (raw_data['x'], raw_data['y'], raw_data['z'])
-                state['timestamp_us'] = raw_data['timestamp_ns'] // 1000
-            
-            self._watch_states[watch_name] = state
-
-            # If we have a complete record (at least one of each sensor type), update the latest data
-            if 'accel' in state and 'gyro' in state:
-                imu_data = juggler_pb2.IMUData()
-                imu_data.timestamp_us = state['timestamp_us']
-                imu_data.watch_name = watch_name
-                imu_data.watch_ip = state['watch_ip']
-                imu_data.acceleration.x, imu_data.acceleration.y, imu_data.acceleration.z = state['accel']
-                imu_data.gyroscope.x, imu_data.gyroscope.y, imu_data.gyroscope.z = state['gyro']
-                
-                with self._data_lock:
-                    self._latest_data[watch_name] = imu_data
+            if isinstance(message, str) or message[0] in _JSON_FIRST_BYTES:
+                decoded = _DECODER.decode(message)
+            else:
+                decoded = _MSGPACK_DECODER.decode(message)
+            if isinstance(decoded, list):
+                for raw_data in decoded:
+                    self._apply_sample(raw_data, ip)
+            else:
+                self._apply_sample(decoded, ip)
 
-        except (json.JSONDecodeError, KeyError):
-            # Ignore malformed or unexpected JSON
+        except msgspec.ValidationError as e:
+            # Well-formed but off-schema; worth saying once, then dropped quietly
+            if ip not in self._invalid_reported:
+                self._invalid_reported.add(ip)
+                print(f"⚠️ Dropping IMU messages from {ip} that don't match the expected schema: {e}")
+        except msgspec.DecodeError:
+            # Ignore malformed payloads
             pass
         except Exception as e:
             print(f"❌ Error processing IMU message: {e}")
 
+    def _apply_sample(self, raw_data: ImuMsg, ip: str):
+        """Folds one decoded sample into the watch state."""
+        watch_name = raw_data.watch_id or ip
+        data_type = raw_data.type
+
+        if not data_type:
+            return
+
+        state = self._watch_states.get(ip)
+        if state is None:
+            state = self._watch_states[ip] = WatchState(ip)
+        state.watch_name = watch_name
+
+        # Update the state with the new data
+        if data_type == 'accel':
+            state.ax, state.ay, state.az = raw_data.x, raw_data.y, raw_data.z
+            state.timestamp_us = int(raw_data.timestamp_ns) // 1000
+            state.have_accel = state.new_accel = True
+        elif data_type == 'gyro':
+            state.gx, state.gy, state.gz = raw_data.x, raw_data.y, raw_data.z
+            state.timestamp_us = int(raw_data.timestamp_ns) // 1000
+            state.have_gyro = state.new_gyro = True
+
+        # If we have a complete record (at least one of each sensor type), update the latest data
+        if state.have_accel and state.have_gyro:
+            raw = (state.timestamp_us, state.ax, state.ay, state.az,
+                   state.gx, state.gy, state.gz, state.watch_ip)
+            
+            self._latest_raw[watch_name] = raw
+            self._latest_snapshot = tuple(self._latest_raw.items())
+            
+            # Log one row per fresh accel+gyro pair
+            if self.database_logger and state.new_accel and state.new_gyro:
+                state.new_accel = state.new_gyro = False
+                if self.database_logger.current_session_id is None:
+                    # Auto-starting a session waits for the DB writer; keep that off the event loop
+                    asyncio.get_running_loop().run_in_executor(
+                        None, self.database_logger.log_imu_raw, watch_name, raw)
+                else:
+                    self.database_logger.log_imu_raw(watch_name, raw)
+
+    def get_latest_data_raw(self) -> Dict[str, Tuple]:
+        """
+        Returns the latest (ts_us, ax, ay, az, gx, gy, gz, ip) tuple per watch.
+        """
+        return dict(self._latest_snapshot)
+
     def get_latest_data(self) -> Dict[str, juggler_pb2.IMUData]:
         """
-        Returns a copy of the latest IMU data from all connected watches.
+        Returns the latest IMU data from all connected watches as protobuf messages.
+        
+        Messages are only rebuilt for watches that have produced a new sample
+        since the previous call.
         """
-        with self._data_lock:
-            return self._latest_data.copy()
+        return {watch_name: self._to_pb(watch_name, raw)
+                for watch_name, raw in self._latest_snapshot}
+
+    def get_latest_data_blob(self) -> bytes:
+        """
+        Returns the latest IMU data as a serialized FrameData holding only imu_data.
+        
+        Serialized protobuf messages merge when concatenated, so appending this
+        to a serialized frame attaches the IMU entries without building them
+        into the frame. Re-serialized only when a new sample has arrived; meant
+        for a single caller thread (the hub's data loop).
+        """
+        snapshot = self._latest_snapshot
+        if snapshot is not self._blob_key:
+            holder = self._blob_frame
+            holder.ClearField("imu_data")
+            holder.imu_data.extend(self._to_pb(watch_name, raw) for watch_name, raw in snapshot)
+            self._blob = holder.SerializeToString()
+            self._blob_key = snapshot
+        return self._blob
+
+    def _to_pb(self, watch_name: str, raw: Tuple) -> juggler_pb2.IMUData:
+        """Builds (or reuses) the IMUData message for one watch's raw tuple."""
+        cached = self._pb_cache.get(watch_name)
+        if cached is not None and cached[0] is raw:
+            return cached[1]
+        
+        ts_us, ax, ay, az, gx, gy, gz, ip = raw
+        imu_data = juggler_pb2.IMUData()
+        imu_data.timestamp_us = ts_us
+        imu_data.watch_name = watch_name
+        imu_data.watch_ip = ip
+        imu_data.acceleration.x, imu_data.acceleration.y, imu_data.acceleration.z = ax, ay, az
+        imu_data.gyroscope.x, imu_data.gyroscope.y, imu_data.gyroscope.z = gx, gy, gz
+        self._pb_cache[watch_name] = (raw, imu_data)
+        return imu_data
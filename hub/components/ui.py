@@ -10,9 +10,8 @@ import threading
 from typing import Optional, Dict, Any
 import os
 
-# Add the api directory to the path for protobuf imports
-api_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'api', 'v1')
-sys.path.insert(0, api_path)
+# Prefer the native (upb) protobuf runtime; must be set before protobuf is first imported
+os.environ.setdefault("PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION", "upb")
 
 try:
     import juggler_pb2
@@ -24,14 +23,18 @@ except ImportError:
 try:
     from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                                 QHBoxLayout, QLabel, QTextEdit, QPushButton, 
-                                QGroupBox, QGridLayout, QProgressBar)
-    from PyQt6.QtCore import QTimer, pyqtSignal, QObject, Qt
+                                QGroupBox, QGridLayout, QProgressBar, QListView,
+                                QPlainTextEdit)
+    from PyQt6.QtCore import QTimer, Qt, QStringListModel
     from PyQt6.QtGui import QFont, QPalette, QColor
     PYQT_AVAILABLE = True
 except ImportError:
     print("⚠️ PyQt6 not available. Using console UI.")
     PYQT_AVAILABLE = False
 
+# The FPS average is shown as 0 once this many frame intervals pass without a frame
+_FPS_STALE_INTERVALS = 3
+
 
 class ConsoleUI:
     """Simple console-based UI for systems without PyQt6."""
@@ -42,6 +45,8 @@ class ConsoleUI:
         self.last_frame_data: Optional[juggler_pb2.FrameData] = None
         self.frame_count = 0
         self.start_time = time.time()
+        # Set by JuggleHubUI.set_frame_source; its counts cover frames never shown
+        self.frame_source = None
         
     def update_frame_data(self, frame_data: juggler_pb2.FrameData):
         """Update with new frame data."""
@@ -51,23 +56,31 @@ class ConsoleUI:
         # Print periodic updates
         if self.frame_count % 30 == 0:  # Every 30 frames (~1 second at 30 FPS)
             elapsed = time.time() - self.start_time
-            fps = self.frame_count / elapsed if elapsed > 0 else 0
+            ingested = self.frame_source.frames_pushed if self.frame_source else self.frame_count
+            fps = ingested / elapsed if elapsed > 0 else 0
+            
+            balls, hands, imu_data = frame_data.balls, frame_data.hands, frame_data.imu_data
+            
+            # Build the whole report and write it once instead of one print per line
+            lines = [f"\n📊 Frame {frame_data.frame_number} | FPS: {fps:.1f} | Balls: {len(balls)}\n"]
             
-            print(f"\n📊 Frame {frame_data.frame_number} | FPS: {fps:.1f} | Balls: {len(frame_data.balls)}")
+            for ball in balls:
+                p3, p2 = ball.position_3d, ball.position_2d
+                lines.append(f"  🏀 Track ID {ball.track_id}: "
+                             f"3D({p3.x:.3f}, {p3.y:.3f}, {p3.z:.3f}) "
+                             f"2D({p2.x:.0f}, {p2.y:.0f}) "
+                             f"conf:{ball.confidence:.2f}\n")
             
-            for i, ball in enumerate(frame_data.balls):
-                print(f"  🏀 Track ID {ball.track_id}: "
-                      f"3D({ball.position_3d.x:.3f}, {ball.position_3d.y:.3f}, {ball.position_3d.z:.3f}) "
-                      f"2D({ball.position_2d.x:.0f}, {ball.position_2d.y:.0f}) "
-                      f"conf:{ball.confidence:.2f}")
+            if hands:
+                lines.append(f"  👋 Hands: {len(hands)}\n")
+                for hand in hands:
+                    p2 = hand.position_2d
+                    lines.append(f"    {hand.side}: 2D({p2.x:.0f}, {p2.y:.0f})\n")
             
-            if frame_data.hands:
-                print(f"  👋 Hands: {len(frame_data.hands)}")
-                for hand in frame_data.hands:
-                    print(f"    {hand.side}: 2D({hand.position_2d.x:.0f}, {hand.position_2d.y:.0f})")
+            if imu_data:
+                lines.append(f"  📱 IMU: {len(imu_data)} sensors\n")
             
-            if frame_data.imu_data:
-                print(f"  📱 IMU: {len(frame_data.imu_data)} sensors")
+            sys.stdout.write("".join(lines))
     
     def run(self):
         """Run the console UI."""
@@ -89,30 +102,51 @@ class ConsoleUI:
 
 
 if PYQT_AVAILABLE:
-    class FrameDataSignal(QObject):
-        """Signal emitter for thread-safe UI updates."""
-        frame_received = pyqtSignal(object)
-    
     class JuggleHubMainWindow(QMainWindow):
         """Main window for JuggleHub UI."""
         
+        # Pre-bound formatter for one ball-list row
+        _BALL_ROW_FMT = "Track ID {}: 3D({:.3f}, {:.3f}, {:.3f}) conf:{:.2f}".format
+        
         def __init__(self, config: dict):
             super().__init__()
             self.config = config
             self.frame_count = 0
             self.start_time = time.time()
+            self.fps = 0.0
+            self._last_frame_ns = 0  # monotonic, for the FPS average
+            # Set by JuggleHubUI.set_frame_source; the relay skips stale frames, so
+            # the frames drawn here undercount what the hub ingested
+            self.frame_source = None
+            self._ingest_fps = 0.0
+            self._rate_count = 0
+            self._rate_ns = time.monotonic_ns()
             self.last_frame_data: Optional[juggler_pb2.FrameData] = None
-            
-            # Signal for thread-safe updates
-            self.signal_emitter = FrameDataSignal()
-            self.signal_emitter.frame_received.connect(self._update_ui)
+            self._last_ball_rows: list = []
+            # Last text set per label and last status fields, to skip no-op updates
+            self._label_text: Dict[Any, str] = {}
+            self._last_status_sig = None
+            # Log timestamp, reformatted only when the second changes
+            self._log_ts_sec = 0
+            self._log_ts_str = ""
+            
+            # Latest frame from the worker thread; the UI timer picks it up, so the
+            # widgets refresh at a fixed rate however fast frames arrive. Frames are
+            # copied in because senders reuse their message; the timer swaps the two
+            # buffers so the one being displayed is never written to.
+            self._frame_lock = threading.Lock()
+            self._pending_frame = juggler_pb2.FrameData()
+            self._shown_frame = juggler_pb2.FrameData()
+            self._dirty = False
             
             self.init_ui()
             
             # Timer for periodic UI updates
+            # (paused while the window is hidden, see showEvent/hideEvent)
+            self._refresh_ms = config.get('ui_refresh_ms', 33)  # ~30 Hz by default
             self.update_timer = QTimer()
             self.update_timer.timeout.connect(self._periodic_update)
-            self.update_timer.start(100)  # Update every 100ms
+            self.update_timer.start(self._refresh_ms)
         
         def init_ui(self):
             """Initialize the user interface."""
@@ -149,9 +183,12 @@ if PYQT_AVAILABLE:
             self.ball_count_label = QLabel("Balls detected: 0")
             ball_layout.addWidget(self.ball_count_label)
             
-            self.ball_list = QTextEdit()
+            # Model/view list: Qt only relayouts rows that changed
+            self.ball_model = QStringListModel()
+            self.ball_list = QListView()
+            self.ball_list.setModel(self.ball_model)
             self.ball_list.setMaximumHeight(200)
-            self.ball_list.setReadOnly(True)
+            self.ball_list.setEditTriggers(QListView.EditTrigger.NoEditTriggers)
             ball_layout.addWidget(self.ball_list)
             
             content_layout.addWidget(ball_group)
@@ -191,9 +228,11 @@ if PYQT_AVAILABLE:
             log_group = QGroupBox("📝 Activity Log")
             log_layout = QVBoxLayout(log_group)
             
-            self.log_text = QTextEdit()
+            # Plain-text log; Qt drops the oldest lines past the block limit
+            self.log_text = QPlainTextEdit()
             self.log_text.setMaximumHeight(150)
             self.log_text.setReadOnly(True)
+            self.log_text.setMaximumBlockCount(100)
             log_layout.addWidget(self.log_text)
             
             main_layout.addWidget(log_group)
@@ -223,7 +262,7 @@ if PYQT_AVAILABLE:
                 QLabel {
                     color: #ffffff;
                 }
-                QTextEdit {
+                QTextEdit, QPlainTextEdit, QListView {
                     background-color: #1e1e1e;
                     border: 1px solid #555555;
                     color: #ffffff;
@@ -232,42 +271,57 @@ if PYQT_AVAILABLE:
         
         def update_frame_data(self, frame_data: juggler_pb2.FrameData):
             """Update with new frame data (called from worker thread)."""
-            self.signal_emitter.frame_received.emit(frame_data)
+            with self._frame_lock:
+                self._pending_frame.CopyFrom(frame_data)
+                self._dirty = True
+                self.frame_count += 1
+                
+                # Exponential moving average of the ingest rate
+                now_ns = time.monotonic_ns()
+                if self._last_frame_ns:
+                    dt = (now_ns - self._last_frame_ns) * 1e-9
+                    if dt > 0:
+                        self.fps = 0.1 * (1.0 / dt) + 0.9 * self.fps
+                self._last_frame_ns = now_ns
         
         def _update_ui(self, frame_data: juggler_pb2.FrameData):
             """Update UI with new frame data (called from main thread)."""
             self.last_frame_data = frame_data
-            self.frame_count += 1
             
             # Update ball information
             ball_count = len(frame_data.balls)
-            self.ball_count_label.setText(f"Balls detected: {ball_count}")
+            self._set_label(self.ball_count_label, f"Balls detected: {ball_count}")
             
-            ball_text = ""
+            row_fmt = self._BALL_ROW_FMT
+            ball_rows = []
             for ball in frame_data.balls:
-                ball_text += f"Track ID {ball.track_id}: "
-                ball_text += f"3D({ball.position_3d.x:.3f}, {ball.position_3d.y:.3f}, {ball.position_3d.z:.3f}) "
-                ball_text += f"conf:{ball.confidence:.2f}\n"
+                p3 = ball.position_3d
+                ball_rows.append(row_fmt(ball.track_id, p3.x, p3.y, p3.z, ball.confidence))
+            if ball_rows != self._last_ball_rows:
+                self._last_ball_rows = ball_rows
+                self.ball_model.setStringList(ball_rows)
             
-            self.ball_list.setPlainText(ball_text)
-            
-            # Update system status
+            # Update system status (only when one of its fields changed)
             if frame_data.HasField('status'):
                 status = frame_data.status
-                self.camera_status.setText(f"📷 Camera: {'Connected' if status.camera_connected else 'Disconnected'}")
-                self.engine_status.setText(f"🔧 Engine: {'Running' if status.engine_running else 'Stopped'}")
-                self.mode_status.setText(f"🎯 Mode: {status.mode}")
-                
-                if status.error_message:
-                    self.log_message(f"❌ Error: {status.error_message}")
+                status_sig = (status.camera_connected, status.engine_running,
+                              status.mode, status.error_message)
+                if status_sig != self._last_status_sig:
+                    self._last_status_sig = status_sig
+                    self._set_label(self.camera_status, f"📷 Camera: {'Connected' if status.camera_connected else 'Disconnected'}")
+                    self._set_label(self.engine_status, f"🔧 Engine: {'Running' if status.engine_running else 'Stopped'}")
+                    self._set_label(self.mode_status, f"🎯 Mode: {status.mode}")
+                    
+                    if status.error_message:
+                        self.log_message(f"❌ Error: {status.error_message}")
             
             # Update hand status
             hand_count = len(frame_data.hands)
-            self.hand_status.setText(f"👋 Hands: {hand_count}")
+            self._set_label(self.hand_status, f"👋 Hands: {hand_count}")
             
             # Update IMU status
             imu_count = len(frame_data.imu_data)
-            self.imu_status.setText(f"📱 IMU: {imu_count} sensors")
+            self._set_label(self.imu_status, f"📱 IMU: {imu_count} sensors")
 
             imu_text = ""
             for imu in frame_data.imu_data:
@@ -280,34 +334,71 @@ if PYQT_AVAILABLE:
             # Update status
             self.status_label.setText(f"✅ Receiving data - Frame {frame_data.frame_number}")
         
+        def _set_label(self, label: QLabel, text: str):
+            """setText only when the text changed; QLabel relayouts even for identical text."""
+            if self._label_text.get(label) != text:
+                self._label_text[label] = text
+                label.setText(text)
+        
+        def showEvent(self, event):
+            """Resume UI refreshes when the window is shown."""
+            super().showEvent(event)
+            if not self.update_timer.isActive():
+                self.update_timer.start(self._refresh_ms)
+        
+        def hideEvent(self, event):
+            """Pause UI refreshes while hidden; frames keep being ingested."""
+            super().hideEvent(event)
+            self.update_timer.stop()
+        
         def _periodic_update(self):
             """Periodic UI updates."""
-            # Calculate FPS
-            elapsed = time.time() - self.start_time
-            fps = self.frame_count / elapsed if elapsed > 0 else 0
-            
-            self.fps_label.setText(f"FPS: {fps:.1f}")
-            self.frame_count_label.setText(f"Frames: {self.frame_count}")
+            if self.isMinimized():
+                return
+            
+            frame_data = None
+            with self._frame_lock:
+                if self._dirty:
+                    self._pending_frame, self._shown_frame = self._shown_frame, self._pending_frame
+                    frame_data = self._shown_frame
+                    self._dirty = False
+            if frame_data is not None:
+                self._update_ui(frame_data)
+            
+            source = self.frame_source
+            if source is None:
+                # The average only moves when a frame arrives, so show 0 once the stream stops
+                fps = self.fps
+                if fps > 0 and (time.monotonic_ns() - self._last_frame_ns) * 1e-9 * fps > _FPS_STALE_INTERVALS:
+                    fps = 0.0
+                self.fps_label.setText(f"FPS: {fps:.1f}")
+                self.frame_count_label.setText(f"Frames: {self.frame_count}")
+            else:
+                # Ingest rate over (at least) the last second, counted by the data loop
+                pushed = source.frames_pushed
+                now_ns = time.monotonic_ns()
+                dt = (now_ns - self._rate_ns) * 1e-9
+                if dt >= 1.0:
+                    self._ingest_fps = (pushed - self._rate_count) / dt
+                    self._rate_count, self._rate_ns = pushed, now_ns
+                self.fps_label.setText(f"Ingest FPS: {self._ingest_fps:.1f}")
+                self.frame_count_label.setText(f"Frames ingested: {pushed} ({source.frames_dropped} not drawn)")
             
             # Check if we're still receiving data
             if self.last_frame_data:
-                current_time = time.time() * 1000000  # Convert to microseconds
-                time_since_last = (current_time - self.last_frame_data.timestamp_us) / 1000000
+                now_us = time.time_ns() // 1000  # Integer microseconds, like timestamp_us
+                time_since_last = (now_us - self.last_frame_data.timestamp_us) / 1e6
                 
                 if time_since_last > 2.0:  # No data for 2 seconds
                     self.status_label.setText("⚠️ No data received recently")
         
         def log_message(self, message: str):
             """Add a message to the activity log."""
-            timestamp = time.strftime("%H:%M:%S")
-            self.log_text.append(f"[{timestamp}] {message}")
-            
-            # Keep log size manageable
-            if self.log_text.document().blockCount() > 100:
-                cursor = self.log_text.textCursor()
-                cursor.movePosition(cursor.MoveOperation.Start)
-                cursor.select(cursor.SelectionType.BlockUnderCursor)
-                cursor.removeSelectedText()
+            now = int(time.time())
+            if now != self._log_ts_sec:
+                self._log_ts_sec = now
+                self._log_ts_str = time.strftime("%H:%M:%S", time.localtime(now))
+            self.log_text.appendPlainText(f"[{self._log_ts_str}] {message}")
 
 
 class JuggleHubUI:
@@ -331,6 +422,13 @@ class JuggleHubUI:
             self.app = None
             self.main_window = None
     
+    def set_frame_source(self, source):
+        """Report frame counts and FPS from ``source`` (a FrameRelay) rather than frames drawn."""
+        if self.ui_type == "pyqt6":
+            self.main_window.frame_source = source
+        else:
+            self.console_ui.frame_source = source
+    
     def update_frame_data(self, frame_data: juggler_pb2.FrameData):
         """Update with new frame data."""
         if self.ui_type == "pyqt6":
@@ -1,22 +1,56 @@
+import os
+from typing import Dict, Optional
+
 import zmq
+
+# Prefer the native (upb) protobuf runtime; must be set before protobuf is first imported
+os.environ.setdefault("PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION", "upb")
+
 import juggler_pb2
 
+from .zmq_util import shared_context
+
 class ZMQClient:
-    def __init__(self, sub_port="5555", req_port="5565"):
-        self.context = zmq.Context()
+    """Engine client: SUB socket for frames, REQ socket for commands.
+    
+    receive_frame_data and send_command return messages that are reused on
+    the next call; copy anything that has to outlive it.
+    """
+    def __init__(self, sub_port="5555", req_port="5565",
+                 socket_options: Optional[Dict[int, int]] = None):
+        # socket_options (e.g. {zmq.RCVHWM: 16}) go on both sockets before they connect
+        socket_options = socket_options or {}
+        self.context = shared_context()
         self.sub_socket = self.context.socket(zmq.SUB)
+        for option, value in socket_options.items():
+            self.sub_socket.setsockopt(option, value)
         self.sub_socket.connect(f"tcp://localhost:{sub_port}")
         self.sub_socket.setsockopt_string(zmq.SUBSCRIBE, "")
         
         self.req_socket = self.context.socket(zmq.REQ)
+        for option, value in socket_options.items():
+            self.req_socket.setsockopt(option, value)
         self.req_socket.connect(f"tcp://localhost:{req_port}")
+        
+        # Parse buffers reused across calls
+        self._rx_frame = juggler_pb2.FrameData()
+        self._rx_resp = juggler_pb2.CommandResponse()
 
     def receive_frame_data(self):
         try:
-            raw_data = self.sub_socket.recv(flags=zmq.NOBLOCK)
-            frame_data = juggler_pb2.FrameData()
-            frame_data.ParseFromString(raw_data)
-            return frame_data
+            # Frames are small: a plain bytes copy is cheaper than wrapping a
+            # zmq.Frame for copy=False (which only pays off for large messages)
+            frame = self.sub_socket.recv(flags=zmq.NOBLOCK)
+            # ParseFromString clears the message first, reusing its submessages
+            self._rx_frame.ParseFromString(frame)
+            return self._rx_frame
+        except zmq.Again:
+            return None
+
+    def receive_frame_data_bytes(self) -> Optional[bytes]:
+        """Like receive_frame_data, but returns the serialized frame without parsing it."""
+        try:
+            return self.sub_socket.recv(flags=zmq.NOBLOCK)
         except zmq.Again:
             return None
 
@@ -24,6 +58,5 @@ class ZMQClient:
         self.req_socket.send(command.SerializeToString())
         response_raw = self.req_socket.recv()
         
-        response = juggler_pb2.CommandResponse()
-        response.ParseFromString(response_raw)
-        return response
+        self._rx_resp.ParseFromString(response_raw)
+        return self._rx_resp
@@ -6,14 +6,14 @@ Handles receiving Protocol Buffer messages from the C++ engine via ZeroMQ.
 
 import zmq
 import threading
+import queue
 import time
-from typing import List, Callable, Optional
+from typing import List, Callable, Optional, Tuple
 import sys
 import os
 
-# Add the api directory to the path for protobuf imports
-api_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'api', 'v1')
-sys.path.insert(0, api_path)
+# Prefer the native (upb) protobuf runtime; must be set before protobuf is first imported
+os.environ.setdefault("PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION", "upb")
 
 try:
     import juggler_pb2
@@ -21,46 +21,100 @@ except ImportError:
     print("❌ Error: Protocol Buffer files not found. Please run 'make generate-proto' first.")
     sys.exit(1)
 
+from .zmq_util import shared_context
+
+from google.protobuf.internal import api_implementation
+from google.protobuf.message import DecodeError
+if api_implementation.Type() not in ("upb", "cpp"):
+    print(f"⚠️ Using the pure-Python protobuf runtime ({api_implementation.Type()}); "
+          "frame parsing will be slow. Install a protobuf>=4.21 wheel for your platform "
+          "(see README, 'Set up Python environment').")
+
+# The FPS average is reported as 0 once this many frame intervals pass without a frame
+_FPS_STALE_INTERVALS = 3
+
 
 class ZMQListener:
-    """ZeroMQ listener for receiving frame data from the C++ engine."""
+    """ZeroMQ listener for receiving frame data from the C++ engine.
+    
+    The socket is CONFLATE, so ZMQ itself keeps only the newest frame. A
+    receive thread hands it to a dispatch thread through a single-slot
+    queue, so a slow callback never holds up the socket.
+    Every frame is parsed into the same FrameData instance, so callbacks must
+    copy whatever they need (or ``CopyFrom`` into their own message) before
+    returning instead of keeping a reference to it.
+    """
     
     def __init__(self, endpoint: str = "tcp://localhost:5555"):
         self.endpoint = endpoint
         self.context: Optional[zmq.Context] = None
         self.socket: Optional[zmq.Socket] = None
+        self.poller: Optional[zmq.Poller] = None
         self.running = False
         self.thread: Optional[threading.Thread] = None
+        self.dispatch_thread: Optional[threading.Thread] = None
+        
+        # Latest-wins handoff from the receive thread to the dispatch thread
+        self._latest: queue.Queue = queue.Queue(maxsize=1)
         
         # Callbacks for frame data
         self.frame_callbacks: List[Callable[[juggler_pb2.FrameData], None]] = []
+        # Immutable snapshot of frame_callbacks read by the listen loop
+        self._callbacks: Tuple[Callable[[juggler_pb2.FrameData], None], ...] = ()
+        
+        # Parse buffer reused for every frame (dispatch thread only)
+        self._parse_buf = juggler_pb2.FrameData()
         
         # Statistics
         self.frames_received = 0
+        # Frames superseded in the dispatch handoff; frames that CONFLATE drops
+        # inside ZMQ are never seen here and so are not counted
+        self.frames_dropped = 0
         self.bytes_received = 0
         self.last_frame_time = 0
         self.fps = 0.0
+        self._last_frame_ns = 0  # monotonic, for the FPS average
+        self._fps_alpha = 0.1  # EMA smoothing factor
         
-        # Error handling
-        self.consecutive_errors = 0
+        # Error handling: one counter per thread, so neither needs a lock
+        self._recv_errors = 0  # listen thread only
+        self._parse_errors = 0  # dispatch thread only
         self.max_consecutive_errors = 10
+        
+        # Returned by get_statistics and refreshed in place on each call
+        self._stats_dict = {
+            'frames_received': 0,
+            'frames_dropped': 0,
+            'bytes_received': 0,
+            'fps': 0.0,
+            'last_frame_time': 0.0,
+            'time_since_last_frame': 0.0,
+            'consecutive_errors': 0,
+            'is_running': False,
+            'endpoint': self.endpoint
+        }
     
     def add_frame_callback(self, callback: Callable[[juggler_pb2.FrameData], None]):
-        """Add a callback function to be called when frame data is received."""
+        """Add a callback function to be called when frame data is received.
+        
+        The FrameData passed in is reused for the next frame; don't keep it.
+        """
         self.frame_callbacks.append(callback)
+        self._callbacks = tuple(self.frame_callbacks)
     
     def remove_frame_callback(self, callback: Callable[[juggler_pb2.FrameData], None]):
         """Remove a callback function."""
         if callback in self.frame_callbacks:
             self.frame_callbacks.remove(callback)
+            self._callbacks = tuple(self.frame_callbacks)
     
     def initialize(self) -> bool:
         """Initialize ZeroMQ connection."""
         try:
             print(f"🔌 Connecting to engine at {self.endpoint}")
             
-            # Create ZMQ context and socket
-            self.context = zmq.Context()
+            # Create the socket on the shared process-wide context
+            self.context = shared_context()
             self.socket = self.context.socket(zmq.SUB)
             
             # Subscribe to all messages (empty filter)
@@ -68,15 +122,22 @@ class ZMQListener:
             
             # Set socket options for better performance
             self.socket.setsockopt(zmq.RCVHWM, 10)  # High water mark
-            self.socket.setsockopt(zmq.RCVTIMEO, 1000)  # 1 second timeout
+            # Consumers only care about the newest frame: let ZMQ keep just that one
+            self.socket.setsockopt(zmq.CONFLATE, 1)
             
             # Connect to the engine
             self.socket.connect(self.endpoint)
             
-            # Start the listening thread
+            # The listen loop sleeps in poll() until a frame arrives
+            self.poller = zmq.Poller()
+            self.poller.register(self.socket, zmq.POLLIN)
+            
+            # Start the receive and dispatch threads
             self.running = True
             self.thread = threading.Thread(target=self._listen_loop, daemon=True)
             self.thread.start()
+            self.dispatch_thread = threading.Thread(target=self._dispatch_loop, daemon=True)
+            self.dispatch_thread.start()
             
             print("✅ ZMQ listener initialized successfully")
             return True
@@ -90,51 +151,46 @@ class ZMQListener:
         """Main listening loop running in a separate thread."""
         print("🎧 ZMQ listener thread started")
         
-        frame_times = []
-        fps_update_interval = 30  # Update FPS every 30 frames
-        
         while self.running:
             try:
-                # Receive message with timeout
+                # Wait for a message; the timeout keeps shutdown responsive
+                if not self.poller.poll(timeout=100):
+                    continue
+                # Frames are small: a plain bytes copy is cheaper than wrapping a
+                # zmq.Frame for copy=False (which only pays off for large messages)
                 message = self.socket.recv(zmq.NOBLOCK)
+                self._recv_errors = 0
                 
                 if message:
+                    # CONFLATE already keeps only the newest queued frame, so
+                    # there is never a backlog to drain here
+                    self.bytes_received += len(message)
+                    
                     # Update statistics
                     current_time = time.time()
                     self.frames_received += 1
-                    self.bytes_received += len(message)
                     
-                    # Calculate FPS
-                    frame_times.append(current_time)
-                    if len(frame_times) > fps_update_interval:
-                        frame_times.pop(0)
-                        if len(frame_times) > 1:
-                            time_span = frame_times[-1] - frame_times[0]
-                            self.fps = (len(frame_times) - 1) / time_span if time_span > 0 else 0
+                    # Exponential moving average of the frame rate
+                    now_ns = time.monotonic_ns()
+                    if self._last_frame_ns:
+                        dt = (now_ns - self._last_frame_ns) * 1e-9
+                        if dt > 0:
+                            alpha = self._fps_alpha
+                            self.fps = alpha * (1.0 / dt) + (1 - alpha) * self.fps
+                    self._last_frame_ns = now_ns
                     
                     self.last_frame_time = current_time
                     
-                    # Parse Protocol Buffer message
+                    # Replace any frame the dispatch thread hasn't picked up yet
                     try:
-                        frame_data = juggler_pb2.FrameData()
-                        frame_data.ParseFromString(message)
-                        
-                        # Call all registered callbacks
-                        for callback in self.frame_callbacks:
-                            try:
-                                callback(frame_data)
-                            except Exception as e:
-                                print(f"⚠️ Error in frame callback: {e}")
-                        
-                        # Reset error counter on successful processing
-                        self.consecutive_errors = 0
-                        
-                    except Exception as e:
-                        print(f"⚠️ Error parsing Protocol Buffer message: {e}")
-                        self.consecutive_errors += 1
+                        self._latest.get_nowait()
+                        self.frames_dropped += 1
+                    except queue.Empty:
+                        pass
+                    self._latest.put_nowait(message)
                 
             except zmq.Again:
-                # Timeout - this is normal, just continue
+                # Poll woke up without a complete message
                 continue
             except zmq.ZMQError as e:
                 if e.errno == zmq.ETERM:
@@ -142,37 +198,85 @@ class ZMQListener:
                     break
                 else:
                     print(f"⚠️ ZMQ error: {e}")
-                    self.consecutive_errors += 1
+                    self._recv_errors += 1
+                    if self._error_limit_reached(self._recv_errors):
+                        break
             except Exception as e:
                 print(f"⚠️ Unexpected error in listen loop: {e}")
-                self.consecutive_errors += 1
-            
-            # Check for too many consecutive errors
-            if self.consecutive_errors >= self.max_consecutive_errors:
-                print(f"❌ Too many consecutive errors ({self.consecutive_errors}). Stopping listener.")
-                break
-            
-            # Brief pause on error to prevent tight error loops
-            if self.consecutive_errors > 0:
-                time.sleep(0.1)
+                self._recv_errors += 1
+                if self._error_limit_reached(self._recv_errors):
+                    break
         
         print("🛑 ZMQ listener thread stopped")
     
+    def _dispatch_loop(self):
+        """Parse the newest received frame and run the callbacks on it."""
+        while self.running:
+            try:
+                message = self._latest.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            
+            # One guard for parse and dispatch; a malformed frame surfaces as DecodeError
+            try:
+                # ParseFromString clears the buffer first, reusing its submessages
+                frame_data = self._parse_buf
+                frame_data.ParseFromString(message)
+                
+                # Call all registered callbacks (usually just one)
+                callbacks = self._callbacks
+                if len(callbacks) == 1:
+                    callbacks[0](frame_data)
+                else:
+                    for callback in callbacks:
+                        callback(frame_data)
+                
+                # Reset error counter on successful processing
+                self._parse_errors = 0
+            except DecodeError as e:
+                print(f"⚠️ Error parsing Protocol Buffer message: {e}")
+                self._parse_errors += 1
+                if self._error_limit_reached(self._parse_errors):
+                    break
+            except Exception as e:
+                print(f"⚠️ Error in frame callback: {e}")
+    
+    def _error_limit_reached(self, errors: int) -> bool:
+        """Stop both threads once either has hit ``max_consecutive_errors``."""
+        if errors < self.max_consecutive_errors:
+            return False
+        print(f"❌ Too many consecutive errors ({errors}). Stopping listener.")
+        self.running = False
+        return True
+    
+    @property
+    def consecutive_errors(self) -> int:
+        """Consecutive receive plus parse errors."""
+        return self._recv_errors + self._parse_errors
+    
     def get_statistics(self) -> dict:
-        """Get current statistics."""
+        """Get current statistics.
+        
+        The same dict is updated and returned on every call; copy it if you
+        need to keep a snapshot.
+        """
         current_time = time.time()
         time_since_last_frame = current_time - self.last_frame_time if self.last_frame_time > 0 else 0
         
-        return {
-            'frames_received': self.frames_received,
-            'bytes_received': self.bytes_received,
-            'fps': self.fps,
-            'last_frame_time': self.last_frame_time,
-            'time_since_last_frame': time_since_last_frame,
-            'consecutive_errors': self.consecutive_errors,
-            'is_running': self.running,
-            'endpoint': self.endpoint
-        }
+        stats = self._stats_dict
+        stats['frames_received'] = self.frames_received
+        stats['frames_dropped'] = self.frames_dropped
+        stats['bytes_received'] = self.bytes_received
+        # The average only moves when a frame arrives, so report 0 once the stream stops
+        fps = self.fps
+        if fps > 0 and (time.monotonic_ns() - self._last_frame_ns) * 1e-9 * fps > _FPS_STALE_INTERVALS:
+            fps = 0.0
+        stats['fps'] = fps
+        stats['last_frame_time'] = self.last_frame_time
+        stats['time_since_last_frame'] = time_since_last_frame
+        stats['consecutive_errors'] = self.consecutive_errors
+        stats['is_running'] = self.running
+        return stats
     
     def is_receiving_data(self, timeout_seconds: float = 5.0) -> bool:
         """Check if we're actively receiving data from the engine."""
@@ -189,20 +293,20 @@ class ZMQListener:
         
         self.running = False
         
-        # Wait for thread to finish
+        # Wait for threads to finish
         if self.thread and self.thread.is_alive():
             self.thread.join(timeout=2.0)
             if self.thread.is_alive():
                 print("⚠️ ZMQ listener thread did not stop gracefully")
+        if self.dispatch_thread and self.dispatch_thread.is_alive():
+            self.dispatch_thread.join(timeout=2.0)
         
-        # Close socket and context
+        # Close the socket; the shared context stays up for other components
+        self.poller = None
         if self.socket:
             self.socket.close()
             self.socket = None
-        
-        if self.context:
-            self.context.term()
-            self.context = None
+        self.context = None
         
         print("✅ ZMQ listener cleanup completed")
     
@@ -0,0 +1,20 @@
+"""
+ZMQ Utilities
+
+Process-wide ZeroMQ context shared by the engine client and listener.
+"""
+
+import zmq
+
+# One I/O thread handles well over a gigabit per second; raise it only if the
+# engine stream ever gets close to that.
+IO_THREADS = 1
+
+
+def shared_context() -> zmq.Context:
+    """Return the process-wide ZMQ context.
+    
+    Components only close their own sockets; the context is never terminated
+    per instance since other components may still be using it.
+    """
+    return zmq.Context.instance(io_threads=IO_THREADS)
@@ -10,19 +10,47 @@ import os
 import sys
 import time
 import argparse
+import logging
+import logging.handlers
+import queue
 import signal
 import threading
 from typing import Optional, List
 
+import zmq
+
 # Add the current directory to Python path for imports
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+# Use the native (upb) protobuf runtime for every component; this has to be set
+# before anything imports protobuf
+os.environ.setdefault("PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION", "upb")
+
 from components.zmq_client import ZMQClient
 from components.ui import JuggleHubUI
 from components.database_logger import DatabaseLogger
 from components.imu_listener import IMUListener
+from components.frame_relay import FrameRelay
 import juggler_pb2
 
+# Compiled frame merge if it has been built (see setup.py), else pure Python
+try:
+    from components._frame_merge import merge_and_dispatch
+except ImportError:
+    from components.frame_merge import merge_and_dispatch
+
+logger = logging.getLogger("jugglehub")
+
+
+def _start_log_listener() -> logging.handlers.QueueListener:
+    """Route ``logger`` through a queue so hot threads never block on stdout."""
+    log_q: queue.SimpleQueue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_q, logging.StreamHandler(sys.stdout))
+    logger.addHandler(logging.handlers.QueueHandler(log_q))
+    logger.propagate = False
+    listener.start()
+    return listener
+
 class JuggleHub:
     """Main JuggleHub application class."""
     
@@ -32,7 +60,12 @@ class JuggleHub:
         
         # Initialize components
         self.zmq_client: Optional[ZMQClient] = None
+        self._poller: Optional[zmq.Poller] = None
+        # Reused to carry IMU data when no engine frame arrived
+        self._frame_scratch = juggler_pb2.FrameData()
         self.ui: Optional[JuggleHubUI] = None
+        # Runs UI updates on their own thread so they never stall the data loop
+        self._ui_relay: Optional[FrameRelay] = None
         self.database_logger: Optional[DatabaseLogger] = None
         self.imu_listener: Optional[IMUListener] = None
         
@@ -48,15 +81,29 @@ class JuggleHub:
             print("🚀 Initializing JuggleHub...")
             
             # Initialize ZMQ client
-            self.zmq_client = ZMQClient()
+            # Small queues and no queuing to half-open peers keep frames and
+            # command replies fresh; keepalive notices a dead engine link
+            self.zmq_client = ZMQClient(socket_options={
+                zmq.RCVHWM: 16,
+                zmq.SNDHWM: 16,
+                zmq.IMMEDIATE: 1,
+                zmq.TCP_KEEPALIVE: 1,
+            })
+            # The data loop sleeps in poll() until the engine sends a frame
+            self._poller = zmq.Poller()
+            self._poller.register(self.zmq_client.sub_socket, zmq.POLLIN)
 
             # Initialize UI
             if self.config['enable_ui']:
                 self.ui = JuggleHubUI(self.config)
+                self._ui_relay = FrameRelay(self.ui)
+                self.ui.set_frame_source(self._ui_relay)
 
             # Initialize DatabaseLogger
             if self.config['enable_logging']:
-                self.database_logger = DatabaseLogger(self.config['database_path'])
+                self.database_logger = DatabaseLogger(self.config['database_path'],
+                                                      packed=self.config.get('packed_logging', False),
+                                                      sessions_dir=self.config.get('sessions_dir'))
                 print(f"📊 Database initialized: {self.config['database_path']}")
 
 
@@ -64,7 +111,8 @@ class JuggleHub:
             if self.config.get('watch_ips'):
                 self.imu_listener = IMUListener(
                     watch_ips=self.config['watch_ips'],
-                    port=self.config.get('imu_port', 8081)
+                    port=self.config.get('imu_port', 8081),
+                    database_logger=self.database_logger
                 )
                 self.imu_listener.start()
             
@@ -77,39 +125,28 @@ class JuggleHub:
 
     def _data_processing_loop(self):
         """The main loop for processing data from all sources."""
+        # Components are fixed once initialized; bind them to locals for the loop
+        poll = self._poller.poll
+        # Frames stay serialized; the UI relay and DB writer parse them on their own threads
+        receive_frame = self.zmq_client.receive_frame_data_bytes
+        get_imu_blob = self.imu_listener.get_latest_data_blob if self.imu_listener else None
+        ui_relay, database_logger = self._ui_relay, self.database_logger
+        frame_scratch = self._frame_scratch
+        
         while self.running:
             try:
-                # 1. Receive ball tracking data from the C++ engine
-                frame_data = self.zmq_client.receive_frame_data()
-
-                # 2. Get the latest IMU data from the listener
-                if self.imu_listener:
-                    imu_datas = self.imu_listener.get_latest_data()
-                else:
-                    imu_datas = {}
+                # 1. Receive ball tracking data from the C++ engine; on timeout the
+                #    IMU data below still goes out in a frame of its own
+                frame_bytes = receive_frame() if poll(50) else None
 
-                # If no ball data, create an empty FrameData to carry the IMU data
-                if not frame_data and imu_datas:
-                    frame_data = juggler_pb2.FrameData()
-                    frame_data.timestamp_us = int(time.time() * 1_000_000)
-                
-                # If we have any data, process it
-                if frame_data:
-                    # Augment with the latest IMU data
-                    del frame_data.imu_data[:]
-                    frame_data.imu_data.extend(list(imu_datas.values()))
-                    
-                    # Pass the combined frame_data to other components
-                    if self.ui:
-                        self.ui.update_frame_data(frame_data)
-                    
-                    if self.database_logger:
-                        self.database_logger.log_frame_data(frame_data)
+                # 2. Get the latest IMU data from the listener, already serialized
+                imu_blob = get_imu_blob() if get_imu_blob is not None else b""
 
-                # Prevent busy-waiting
-                time.sleep(0.001)
-            except Exception as e:
-                print(f"❌ Error in data processing loop: {e}")
+                # 3. Attach the IMU data and pass the frame to the UI and database
+                merge_and_dispatch(frame_bytes, imu_blob, ui_relay,
+                                   database_logger, frame_scratch)
+            except Exception:
+                logger.exception("❌ Error in data processing loop")
                 time.sleep(1) # Avoid spamming errors if in a tight loop
 
     def run(self):
@@ -120,6 +157,9 @@ class JuggleHub:
         self.running = True
         print("🎯 JuggleHub is running...")
         
+        if self._ui_relay:
+            self._ui_relay.start()
+        
         # Start the data processing loop in a background thread
         self._data_thread = threading.Thread(target=self._data_processing_loop, daemon=True)
         self._data_thread.start()
@@ -152,6 +192,8 @@ class JuggleHub:
         # Join the data processing thread
         if self._data_thread and self._data_thread.is_alive():
             self._data_thread.join(timeout=2.0)
+        if self._ui_relay:
+            self._ui_relay.stop()
         
         # Cleanup other components
         if self.database_logger:
@@ -194,6 +236,16 @@ def parse_arguments():
     parser.add_argument('--database-path', type=str, default='juggling_data.db',
                        help='Path to SQLite database file (default: juggling_data.db)')
     
+    parser.add_argument('--packed-logging', action='store_true',
+                       help='Log each frame as a single serialized row (expand later with --expand-packed)')
+    
+    parser.add_argument('--sessions-dir', type=str,
+                       help='Write each session to its own database file in this directory')
+    
+    parser.add_argument('--expand-packed', action='store_true',
+                       help='Expand packed frames in --database-path into the normalized tables and exit '
+                            '(IMU data embedded in frames is dropped; it is already logged separately)')
+    
     parser.add_argument('--config-dir', type=str,
                        help='Directory for configuration files')
     
@@ -203,7 +255,10 @@ def parse_arguments():
     parser.add_argument('--profile', action='store_true',
                        help='Enable performance profiling')
     
-    return parser.parse_args()
+    args = parser.parse_args()
+    if args.expand_packed and args.sessions_dir:
+        parser.error("--expand-packed only works on --database-path, not on per-session files from --sessions-dir")
+    return args
 
 
 def main():
@@ -218,11 +273,21 @@ def main():
         'enable_ui': not args.no_ui,
         'enable_logging': not args.no_logging,
         'database_path': args.database_path,
+        'packed_logging': args.packed_logging,
+        'sessions_dir': args.sessions_dir,
         'config_dir': args.config_dir or os.path.join(os.path.dirname(__file__), 'config'),
         'debug': args.debug,
         'profile': args.profile
     }
     
+    if args.expand_packed:
+        database_logger = DatabaseLogger(config['database_path'])
+        try:
+            database_logger.expand_packed_frames()
+        finally:
+            database_logger.cleanup()
+        return
+    
     # Ensure config directory exists
     os.makedirs(config['config_dir'], exist_ok=True)
     
@@ -232,25 +297,29 @@ def main():
     
     # Create and run JuggleHub
     hub = JuggleHub(config)
+    log_listener = _start_log_listener()
     
-    if config['profile']:
-        import cProfile
-        import pstats
-        
-        print("📊 Performance profiling enabled")
-        profiler = cProfile.Profile()
-        profiler.enable()
-        
-        try:
+    try:
+        if config['profile']:
+            import cProfile
+            import pstats
+            
+            print("📊 Performance profiling enabled")
+            profiler = cProfile.Profile()
+            profiler.enable()
+            
+            try:
+                hub.run()
+            finally:
+                profiler.disable()
+                stats = pstats.Stats(profiler)
+                stats.sort_stats('cumulative')
+                stats.print_stats(20)  # Print top 20 functions
+        else:
             hub.run()
-        finally:
-            profiler.disable()
-            stats = pstats.Stats(profiler)
-            stats.sort_stats('cumulative')
-            stats.print_stats(20)  # Print top 20 functions
-    else:
-        hub.run()
-
+    finally:
+        # Flush anything still queued for the log writer
+        log_listener.stop()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
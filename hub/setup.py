@@ -0,0 +1,15 @@
+"""
+Builds the optional Cython extension for the hub's data loop:
+
+    python setup.py build_ext --inplace
+
+Without it main.py uses the pure-Python components/frame_merge.py.
+"""
+
+from setuptools import setup
+from Cython.Build import cythonize
+
+setup(
+    name="jugglehub-extensions",
+    ext_modules=cythonize("components/_frame_merge.pyx", language_level=3),
+)
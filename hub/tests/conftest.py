@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The hub runs from its own directory (components/, juggler_pb2 at top level)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,142 @@
+import pytest
+
+import juggler_pb2
+from components.database_logger import DatabaseLogger
+
+
+@pytest.fixture
+def make_logger(tmp_path):
+    """Create DatabaseLoggers under tmp_path and clean them all up afterwards."""
+    loggers = []
+    
+    def make(name="test.db", **kwargs):
+        path = name if name == ":memory:" else str(tmp_path / name)
+        logger = DatabaseLogger(path, **kwargs)
+        loggers.append(logger)
+        return logger
+    
+    yield make
+    for logger in loggers:
+        logger.cleanup()
+
+
+def _frame(number, balls=2, hands=1):
+    frame = juggler_pb2.FrameData()
+    frame.frame_number = number
+    frame.timestamp_us = 1_000_000 + number * 33_333
+    frame.frame_width, frame.frame_height = 640, 480
+    frame.status.camera_connected = True
+    frame.status.mode = "tracking"
+    for i in range(balls):
+        ball = frame.balls.add()
+        ball.track_id = i
+        ball.position_3d.x, ball.position_3d.y, ball.position_3d.z = 0.1 * i, 0.2, 0.8
+        ball.position_2d.x, ball.position_2d.y = 320 + i, 240
+        ball.confidence = 0.9
+        ball.timestamp_us = frame.timestamp_us
+    for _ in range(hands):
+        hand = frame.hands.add()
+        hand.side = "left"
+        hand.position_2d.x = 100
+    return frame
+
+
+def _count(logger, table):
+    return logger.connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def test_session_row_counts(make_logger):
+    logger = make_logger()
+    session_id = logger.start_session("s1")
+    for i in range(5):
+        logger.log_frame_data(_frame(i))
+    logger.end_session()
+    
+    assert (_count(logger, "frames"), _count(logger, "balls"), _count(logger, "hands")) == (5, 10, 5)
+    assert (logger.frames_logged, logger.balls_logged, logger.hands_logged) == (5, 10, 5)
+    [(sid, _start, end, total_frames, total_balls, _notes)] = logger.get_sessions()
+    assert (sid, total_frames, total_balls) == (session_id, 5, 10)
+    assert end is not None
+
+
+def test_starting_a_session_ends_the_previous_one(make_logger):
+    logger = make_logger()
+    logger.start_session("x1")
+    for i in range(3):
+        logger.log_frame_data(_frame(i))
+    logger.start_session("x2")
+    logger.log_frame_data(_frame(0))
+    logger.end_session()
+    
+    sessions = {row[0]: row for row in logger.get_sessions()}
+    assert sessions["x1"][2] is not None and sessions["x1"][3] == 3
+    assert sessions["x2"][2] is not None and sessions["x2"][3] == 1
+
+
+@pytest.mark.parametrize("packed", [False, True])
+def test_malformed_frame_is_skipped(make_logger, packed):
+    # Long commit thresholds: the bad frame shares a transaction with the good ones
+    logger = make_logger(commit_every_frames=1000, commit_interval_s=5, packed=packed)
+    logger.start_session()
+    for i in range(20):
+        logger.log_frame_bytes(_frame(i).SerializeToString())
+    logger.log_frame_bytes(b"\xff\xff\xff")
+    logger.end_session()
+    
+    assert _count(logger, "frames_packed" if packed else "frames") == 20
+    assert logger.frames_logged == 20
+
+
+def test_packed_frames_expand_to_normalized_rows(make_logger):
+    normal = make_logger("normal.db")
+    packed = make_logger("packed.db", packed=True)
+    for logger in (normal, packed):
+        logger.start_session("s1")
+        for i in range(10):
+            logger.log_frame_data(_frame(i, balls=i % 3, hands=i % 2))
+        logger.end_session()
+    
+    assert packed.expand_packed_frames() == 10
+    assert _count(packed, "frames_packed") == 0
+    
+    frame_sql = """SELECT session_id, frame_number, timestamp_us, frame_width, frame_height,
+                          system_status FROM frames ORDER BY frame_number"""
+    ball_sql = """SELECT f.frame_number, b.ball_id, b.position_3d_x, b.position_2d_x, b.confidence
+                  FROM balls b JOIN frames f ON f.id = b.frame_id ORDER BY 1, 2"""
+    hand_sql = """SELECT f.frame_number, h.side, h.position_2d_x
+                  FROM hands h JOIN frames f ON f.id = h.frame_id ORDER BY 1"""
+    for sql in (frame_sql, ball_sql, hand_sql):
+        assert packed.connection.execute(sql).fetchall() == normal.connection.execute(sql).fetchall()
+
+
+def test_memory_database(make_logger):
+    logger = make_logger(":memory:")
+    logger.start_session("mem")
+    logger.log_frame_data(_frame(1))
+    logger.end_session()
+    
+    assert _count(logger, "frames") == 1
+    assert [row[0] for row in logger.get_sessions()] == ["mem"]
+
+
+def test_sessions_dir_writes_each_session_to_its_own_file(make_logger, tmp_path):
+    logger = make_logger("meta.db", sessions_dir=str(tmp_path / "sessions"))
+    for session_id, n_frames in (("a", 2), ("b", 3)):
+        logger.start_session(session_id)
+        for i in range(n_frames):
+            logger.log_frame_data(_frame(i))
+        logger.end_session()
+    
+    assert _count(logger, "frames") == 0  # the meta database only indexes sessions
+    for session_id, n_frames in (("a", 2), ("b", 3)):
+        connection = logger.attach_session(session_id)
+        try:
+            assert connection.execute("SELECT COUNT(*) FROM s.frames").fetchone()[0] == n_frames
+        finally:
+            connection.close()
+
+
+def test_attach_session_rejects_bad_alias(make_logger, tmp_path):
+    logger = make_logger("meta.db", sessions_dir=str(tmp_path / "sessions"))
+    with pytest.raises(ValueError):
+        logger.attach_session("a", alias="s; DROP TABLE sessions")
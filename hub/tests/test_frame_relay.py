@@ -0,0 +1,30 @@
+import threading
+
+import juggler_pb2
+from components.frame_relay import FrameRelay
+
+
+class _Recorder:
+    def __init__(self):
+        self.frame_numbers = []
+        self.updated = threading.Event()
+    
+    def update_frame_data(self, frame_data):
+        self.frame_numbers.append(frame_data.frame_number)
+        self.updated.set()
+
+
+def test_relay_shows_only_the_newest_frame():
+    target = _Recorder()
+    relay = FrameRelay(target)
+    # Queued before the consumer starts, as after a UI stall
+    for i in range(5):
+        relay.push(juggler_pb2.FrameData(frame_number=i).SerializeToString())
+    relay.start()
+    try:
+        assert target.updated.wait(timeout=2.0)
+    finally:
+        relay.stop()
+    
+    assert target.frame_numbers == [4]
+    assert (relay.frames_pushed, relay.frames_dropped) == (5, 4)
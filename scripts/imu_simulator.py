@@ -11,44 +11,86 @@ import asyncio
 import websockets
 import json
 import time
-import random
 import argparse
 import threading
 from typing import Set
 
+import numpy as np
+
+try:
+    import msgspec
+    MSGSPEC_AVAILABLE = True
+except ImportError:
+    MSGSPEC_AVAILABLE = False
+
+try:
+    import uvloop
+    UVLOOP_AVAILABLE = True
+except ImportError:
+    UVLOOP_AVAILABLE = False
+
 # A set to keep track of all connected clients
 CONNECTED_CLIENTS: Set[websockets.WebSocketServerProtocol] = set()
 
-async def broadcast_imu_data(watch_id: str, rate_hz: int):
+# Above this rate, ticks are grouped so each frame carries ~10 ms of samples
+BATCH_TARGET_HZ = 100
+
+# Per-axis scale/offset turning U(-1, 1) noise into (ax, ay, az, gx, gy, gz)
+_SAMPLE_SCALE = np.array([0.5, 0.5, 0.5, 1.0, 1.0, 1.0])
+_SAMPLE_OFFSET = np.array([9.8, 0.0, 0.0, 0.0, 0.0, 0.0])
+
+def imu_samples(block: int = 1024):
+    """Yields random (ax, ay, az, gx, gy, gz) rows, drawn from NumPy a block at a time."""
+    rng = np.random.default_rng()
+    while True:
+        rows = rng.uniform(-1.0, 1.0, size=(block, 6)) * _SAMPLE_SCALE + _SAMPLE_OFFSET
+        yield from rows.tolist()
+
+def _json_batch(parts):
+    """Joins already encoded JSON samples into one JSON array."""
+    return "[" + ",".join(parts) + "]"
+
+def _msgpack_batch(parts):
+    """Wraps already encoded MessagePack samples in one MessagePack array."""
+    return msgspec.msgpack.encode([msgspec.Raw(p) for p in parts])
+
+async def broadcast_imu_data(watch_id: str, rate_hz: int, use_msgpack: bool = False):
     """Periodically generates and broadcasts IMU data to all connected clients."""
-    print(f"🚀 Starting data broadcast for '{watch_id}' at {rate_hz} Hz...")
+    wire_format = "MessagePack" if use_msgpack else "JSON"
+    print(f"🚀 Starting data broadcast for '{watch_id}' at {rate_hz} Hz ({wire_format})...")
+    if use_msgpack:
+        encode_sample, encode_batch = msgspec.msgpack.encode, _msgpack_batch
+    else:
+        encode_sample, encode_batch = json.dumps, _json_batch
+    batch_ticks = max(1, rate_hz // BATCH_TARGET_HZ)
+    pending = []
+    samples = imu_samples()
+    
+    # Separate messages for accel and gyro, like the real watch; built once
+    # and refreshed in place each tick (they're serialized before reuse)
+    accel_data = {"watch_id": watch_id, "type": "accel", "timestamp_ns": 0, "x": 0.0, "y": 0.0, "z": 0.0}
+    gyro_data = {"watch_id": watch_id, "type": "gyro", "timestamp_ns": 0, "x": 0.0, "y": 0.0, "z": 0.0}
     while True:
         try:
             timestamp_ns = time.time_ns()
+            ax, ay, az, gx, gy, gz = next(samples)
             
-            # Create separate messages for accel and gyro, like the real watch
-            accel_data = {
-                "watch_id": watch_id,
-                "type": "accel",
-                "timestamp_ns": timestamp_ns,
-                "x": 9.8 + random.uniform(-0.5, 0.5),
-                "y": random.uniform(-0.5, 0.5),
-                "z": random.uniform(-0.5, 0.5)
-            }
+            accel_data["timestamp_ns"] = timestamp_ns
+            accel_data["x"], accel_data["y"], accel_data["z"] = ax, ay, az
             
-            gyro_data = {
-                "watch_id": watch_id,
-                "type": "gyro",
-                "timestamp_ns": timestamp_ns,
-                "x": random.uniform(-1.0, 1.0),
-                "y": random.uniform(-1.0, 1.0),
-                "z": random.uniform(-1.0, 1.0)
-            }
+            gyro_data["timestamp_ns"] = timestamp_ns
+            gyro_data["x"], gyro_data["y"], gyro_data["z"] = gx, gy, gz
             
-            # Broadcast to all connected clients
-            if CONNECTED_CLIENTS:
-                await asyncio.wait([client.send(json.dumps(accel_data)) for client in CONNECTED_CLIENTS])
-                await asyncio.wait([client.send(json.dumps(gyro_data)) for client in CONNECTED_CLIENTS])
+            pending.append(encode_sample(accel_data))
+            pending.append(encode_sample(gyro_data))
+            
+            # Broadcast one pre-serialized array to all connected clients
+            if len(pending) >= 2 * batch_ticks:
+                payload = encode_batch(pending)
+                pending.clear()
+                if CONNECTED_CLIENTS:
+                    await asyncio.gather(*(client.send(payload) for client in CONNECTED_CLIENTS),
+                                         return_exceptions=True)
             
             await asyncio.sleep(1.0 / rate_hz)
             
@@ -73,7 +115,7 @@ async def connection_handler(websocket: websockets.WebSocketServerProtocol, path
     finally:
         CONNECTED_CLIENTS.remove(websocket)
 
-async def start_server(host: str, port: int, watch_id: str, rate_hz: int):
+async def start_server(host: str, port: int, watch_id: str, rate_hz: int, use_msgpack: bool = False):
     """Starts the WebSocket server and the data broadcast task."""
     print(f"🔗 Starting WebSocket IMU simulator server for '{watch_id}'...")
     print(f"   Listening on ws://{host}:{port}/imu")
@@ -81,7 +123,7 @@ async def start_server(host: str, port: int, watch_id: str, rate_hz: int):
     server = await websockets.serve(connection_handler, host, port)
     
     # Run the data broadcast task concurrently
-    broadcast_task = asyncio.create_task(broadcast_imu_data(watch_id, rate_hz))
+    broadcast_task = asyncio.create_task(broadcast_imu_data(watch_id, rate_hz, use_msgpack))
     
     await server.wait_closed()
     broadcast_task.cancel()
@@ -97,15 +139,26 @@ def main():
                         help="The identifier for the simulated watch (e.g., left_watch)")
     parser.add_argument('--rate', type=int, default=100,
                         help="The rate to send data in Hz (default: 100)")
+    parser.add_argument('--msgpack', action='store_true',
+                        help="Send binary MessagePack frames instead of JSON text")
     
     args = parser.parse_args()
     
+    if args.msgpack and not MSGSPEC_AVAILABLE:
+        parser.error("--msgpack requires msgspec (pip install msgspec)")
+    
+    if UVLOOP_AVAILABLE:
+        # libuv-based loop; cuts per-send scheduling overhead with many clients
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        print("⚡ Using uvloop event loop")
+    
     try:
         asyncio.run(start_server(
             host=args.host,
             port=args.port,
             watch_id=args.watch_id,
-            rate_hz=args.rate
+            rate_hz=args.rate,
+            use_msgpack=args.msgpack
         ))
     except KeyboardInterrupt:
         print("\n🛑 Server stopped by user.")
@@ -4,10 +4,28 @@ import argparse
 sys.path.append('../hub')
 from hub.juggler_pb2 import CommandRequest
 
-def send_command(module_name, ip, port):
-    context = zmq.Context()
+COMMAND_ENDPOINT = "tcp://127.0.0.1:5565"
+REPLY_TIMEOUT_MS = 2000
+
+# One process-wide context; batch callers reuse it (and a socket) across commands
+context = zmq.Context.instance(io_threads=1)
+
+def open_socket(endpoint=COMMAND_ENDPOINT):
+    """Opens a REQ socket that fails fast and stays usable after a timeout."""
     socket = context.socket(zmq.REQ)
-    socket.connect("tcp://127.0.0.1:5565")
+    socket.setsockopt(zmq.LINGER, 0)
+    socket.setsockopt(zmq.RCVTIMEO, REPLY_TIMEOUT_MS)
+    # Allow a new request after a lost reply instead of wedging the REQ state machine
+    socket.setsockopt(zmq.REQ_RELAXED, 1)
+    socket.setsockopt(zmq.REQ_CORRELATE, 1)
+    socket.connect(endpoint)
+    return socket
+
+def send_command(module_name, ip, port, socket=None):
+    """Sends a LOAD_MODULE command; pass an open socket to reuse it across calls."""
+    owns_socket = socket is None
+    if owns_socket:
+        socket = open_socket()
 
     command = CommandRequest()
     command.type = CommandRequest.LOAD_MODULE
@@ -17,9 +35,17 @@ def send_command(module_name, ip, port):
     if port:
         command.module_args["port"] = str(port)
 
-    socket.send(command.SerializeToString())
-    response_raw = socket.recv()
-    print(f"Received reply: {response_raw}")
+    try:
+        socket.send(command.SerializeToString())
+        response_raw = socket.recv()
+        print(f"Received reply: {response_raw}")
+        return response_raw
+    except zmq.Again:
+        print(f"No reply within {REPLY_TIMEOUT_MS} ms")
+        return None
+    finally:
+        if owns_socket:
+            socket.close()
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
@@ -55,15 +55,15 @@ fi
 
 # Generate Python Protocol Buffer files if they don't exist or are outdated
 PROTO_FILE="$API_DIR/juggler.proto"
-PY_PROTO_FILE="$API_DIR/juggler_pb2.py"
+PY_PROTO_FILE="$HUB_DIR/juggler_pb2.py"
 
 if [ ! -f "$PY_PROTO_FILE" ] || [ "$PROTO_FILE" -nt "$PY_PROTO_FILE" ]; then
     echo -e "${YELLOW}🔄 Generating Python Protocol Buffer files...${NC}"
     
     cd "$API_DIR"
-    protoc --python_out=. juggler.proto
+    protoc --python_out="$HUB_DIR" juggler.proto
     
-    if [ -f "juggler_pb2.py" ]; then
+    if [ -f "$PY_PROTO_FILE" ]; then
         echo -e "${GREEN}✅ Protocol Buffer files generated${NC}"
     else
         echo -e "${RED}❌ Error: Failed to generate Protocol Buffer files${NC}"
@@ -203,9 +203,6 @@ cd "$HUB_DIR"
 echo -e "${BLUE}🎯 Starting JuggleHub...${NC}"
 echo -e "${BLUE}Arguments passed to hub: ${HUB_ARGS[*]}${NC}"
 
-# Add the API directory to Python path
-export PYTHONPATH="$API_DIR:$PYTHONPATH"
-
 # Run the hub
 python3 main.py "${HUB_ARGS[@]}"
 
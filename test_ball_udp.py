@@ -4,29 +4,99 @@ Direct UDP test script to send color commands to the ball
 This bypasses the entire JuggleHub system to test basic connectivity
 """
 
+import argparse
+import os
+import select
 import socket
 import time
 import sys
 
-def send_udp_packet(ip, port, packet_data):
-    """Send a UDP packet to the specified IP and port"""
+# Set by -v: print each packet's bytes before sending
+VERBOSE = False
+
+# Small fixed send buffer and low-delay marking for the tiny command packets
+SNDBUF_BYTES = 65536
+IPTOS_LOWDELAY = 0x10
+
+def _tune_socket(sock):
+    """Apply send buffer size, TOS and (Linux) priority to a UDP socket"""
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SNDBUF_BYTES)
+    sock.setsockopt(socket.IPPROTO_IP, socket.IP_TOS, IPTOS_LOWDELAY)
+    if hasattr(socket, "SO_PRIORITY"):
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_PRIORITY, 6)
+
+BALL_PORT = 41412
+
+# One socket serves every send in the script. It is connected to the ball, so
+# the kernel caches the route and reports ICMP errors on later sends.
+_sock = None
+_peer = None
+
+def get_socket(address):
+    """Return the shared UDP socket connected to address, creating it on first use"""
+    global _sock, _peer
+    if _sock is None:
+        _sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        _sock.setblocking(False)
+        _tune_socket(_sock)
+    if _peer != address:
+        _sock.connect(address)
+        _peer = address
+    return _sock
+
+if os.name == "posix":
+    def _raw_send(sock, data):
+        """write(2) on the connected socket's fd, skipping socket.send's argument handling"""
+        return os.write(sock.fileno(), data)
+else:
+    # Windows sockets aren't file descriptors
+    _raw_send = socket.socket.send
+
+def _send_once(sock, data, timeout):
+    """Send on the non-blocking socket, waiting up to timeout if its buffer is full"""
     try:
-        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        sock.settimeout(2.0)  # 2 second timeout
-        
-        print(f"Sending UDP packet to {ip}:{port}")
-        print(f"Packet data: {[hex(b) for b in packet_data]}")
-        print(f"Packet bytes: {packet_data}")
+        _raw_send(sock, data)
+    except BlockingIOError:
+        _, writable, _ = select.select([], [sock], [], timeout)
+        if not writable:
+            raise socket.timeout("send buffer stayed full")
+        _raw_send(sock, data)
+
+def _send(sock, data, timeout=2.0):
+    """Send data, raising ConnectionRefusedError if the ball's port refused a packet
+
+    The connected socket reports an earlier packet's ICMP port-unreachable on
+    the next send, and that send does not go out, so it is retried once before
+    the refusal is reported.
+    """
+    try:
+        _send_once(sock, data, timeout)
+    except ConnectionRefusedError:
+        try:
+            _send_once(sock, data, timeout)
+        except ConnectionRefusedError:
+            pass
+        raise
+
+def send_udp_packet(address, packet_data):
+    """Send a UDP packet to the specified (ip, port) address"""
+    try:
+        print(f"Sending UDP packet to {address[0]}:{address[1]}")
+        if VERBOSE:
+            print(f"Packet data: {[hex(b) for b in packet_data]}")
+            print(f"Packet bytes: {packet_data}")
         
-        sock.sendto(packet_data, (ip, port))
+        _send(get_socket(address), packet_data)
         print("✅ Packet sent successfully")
         
-        sock.close()
         return True
         
     except socket.timeout:
         print("❌ Socket timeout - no response from ball")
         return False
+    except ConnectionRefusedError:
+        print("❌ Port unreachable - the ball rejected a packet (nothing listening?); counting this test as failed")
+        return False
     except socket.gaierror as e:
         print(f"❌ DNS/Address error: {e}")
         return False
@@ -34,56 +104,67 @@ def send_udp_packet(ip, port, packet_data):
         print(f"❌ Error sending packet: {e}")
         return False
 
-def test_ball_color(ip, port=41412):
+# Format from UdpBallColorModule.cpp:
+# Header: [66, 0, 0, 0, 0, 0]
+# Color data: [0x0a, R, G, B]
+_HEADER = b"\x42\x00\x00\x00\x00\x00"
+_COLOR_CMD = b"\x0a"
+_COLORS = (
+    ("Red (255, 0, 0)", b"\xff\x00\x00"),
+    ("Green (0, 255, 0)", b"\x00\xff\x00"),
+    ("Blue (0, 0, 255)", b"\x00\x00\xff"),
+)
+_RED = _COLORS[0][1]
+
+# Built once at import as (name, packet) pairs: the C++ format for each color,
+# then alternative layouts of the red command
+TEST_CASES = tuple((f"{name} - Current C++ format", _HEADER + _COLOR_CMD + rgb)
+                   for name, rgb in _COLORS) + (
+    ("Red - Alternative format (no header)", _COLOR_CMD + _RED),
+    ("Red - Simple RGB format", _RED),
+    ("Red - With different header", b"\x42\x00" + _RED),
+)
+
+def _ask(prompt):
+    """Prompt on stdout and read one answer from stdin (no readline module)"""
+    sys.stdout.write(prompt)
+    sys.stdout.flush()
+    return sys.stdin.readline().strip().lower()
+
+def print_possible_issues(port=BALL_PORT):
+    """Print the usual reasons a ball doesn't react to packets"""
+    print("Possible issues:")
+    print("- Ball is not powered on")
+    print("- Ball is not connected to network")
+    print(f"- Ball uses different port (not {port})")
+    print("- Ball uses different packet format")
+    print("- Network firewall blocking UDP")
+
+def test_ball_color(ip, port=BALL_PORT):
     """Test different color packet formats based on the C++ code"""
     
     print(f"🎯 Testing ball at {ip}:{port}")
     print("=" * 50)
     
-    # Format from UdpBallColorModule.cpp:
-    # Header: [66, 0, 0, 0, 0, 0]
-    # Color data: [0x0a, R, G, B]
-    
-    test_cases = [
-        {
-            "name": "Red (255, 0, 0) - Current C++ format",
-            "packet": bytes([66, 0, 0, 0, 0, 0, 0x0a, 255, 0, 0])
-        },
-        {
-            "name": "Green (0, 255, 0) - Current C++ format", 
-            "packet": bytes([66, 0, 0, 0, 0, 0, 0x0a, 0, 255, 0])
-        },
-        {
-            "name": "Blue (0, 0, 255) - Current C++ format",
-            "packet": bytes([66, 0, 0, 0, 0, 0, 0x0a, 0, 0, 255])
-        },
-        {
-            "name": "Red - Alternative format (no header)",
-            "packet": bytes([0x0a, 255, 0, 0])
-        },
-        {
-            "name": "Red - Simple RGB format",
-            "packet": bytes([255, 0, 0])
-        },
-        {
-            "name": "Red - With different header",
-            "packet": bytes([0x42, 0x00, 255, 0, 0])
-        }
-    ]
-    
-    for i, test in enumerate(test_cases, 1):
-        print(f"\n{i}. Testing: {test['name']}")
-        success = send_udp_packet(ip, port, test['packet'])
+    address = (ip, port)
+    for i, (name, packet) in enumerate(TEST_CASES, 1):
+        print(f"\n{i}. Testing: {name}")
+        success = send_udp_packet(address, packet)
+        
+        # UDP has no handshake, so the first real packet doubles as the connectivity test
+        if not success and i == 1:
+            print("⚠️  Basic connectivity test failed; continuing with the other formats anyway")
+            print_possible_issues(port)
         
         if success:
             print("   Waiting 2 seconds to observe ball color change...")
             time.sleep(2)
             
-            response = input("   Did the ball change color? (y/n/q to quit): ").lower().strip()
+            response = _ask("   Did the ball change color? (y/n/q to quit): ")
             if response == 'y':
-                print(f"🎉 SUCCESS! Working packet format: {test['name']}")
-                print(f"   Packet: {[hex(b) for b in test['packet']]}")
-                return test['packet']
+                print(f"🎉 SUCCESS! Working packet format: {name}")
+                print(f"   Packet: {[hex(b) for b in packet]}")
+                return packet
             elif response == 'q':
                 print("   Test stopped by user")
                 return None
@@ -93,29 +174,73 @@ def test_ball_color(ip, port=41412):
     print("\n❌ None of the packet formats worked")
     return None
 
-def main():
-    if len(sys.argv) != 2:
-        print("Usage: python3 test_ball_udp.py <ball_ip>")
-        print("Example: python3 test_ball_udp.py 10.54.136.205")
-        sys.exit(1)
+def _pace(deadline_ns):
+    """Spin until perf_counter_ns() reaches deadline_ns (time.sleep jitters by tens of µs)"""
+    while time.perf_counter_ns() < deadline_ns:
+        pass
+
+def stream_packets(address, packet, count, interval_us):
+    """Send packet count times, paced interval_us apart, and report the achieved rate"""
+    sock = get_socket(address)
+    interval_ns = interval_us * 1000
+    sent = failed = refused = 0
+    
+    start_ns = time.perf_counter_ns()
+    for i in range(count):
+        _pace(start_ns + i * interval_ns)
+        try:
+            _send(sock, packet)
+            sent += 1
+        except ConnectionRefusedError:
+            refused += 1
+        except OSError:
+            failed += 1
+    elapsed_s = max(time.perf_counter_ns() - start_ns, 1) / 1e9
     
-    ball_ip = sys.argv[1]
+    print(f"📤 Sent {sent}/{count} packets to {address[0]}:{address[1]} in {elapsed_s:.3f}s "
+          f"({sent / elapsed_s:.0f} packets/s, {failed} failed, {refused} refused)")
+    if refused:
+        print("❌ Port unreachable - nothing seems to be listening on the ball's port")
+    return sent
+
+def _non_negative_int(text):
+    """argparse type for counts: an int that is 0 or more"""
+    value = int(text)
+    if value < 0:
+        raise argparse.ArgumentTypeError(f"must be 0 or more, got {value}")
+    return value
+
+def main():
+    global VERBOSE
+    parser = argparse.ArgumentParser(description="Send test color packets straight to a ball over UDP",
+                                     epilog="Example: python3 test_ball_udp.py 10.54.136.205")
+    parser.add_argument("ball_ip", help="IP address (or hostname) of the ball")
+    parser.add_argument("--port", type=int, default=BALL_PORT,
+                        help=f"UDP port of the ball (default: {BALL_PORT})")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="Print each packet's bytes before sending it")
+    parser.add_argument("--count", type=_non_negative_int, default=None,
+                        help="Non-interactive: send the C++-format red packet this many times and exit")
+    parser.add_argument("--interval-us", type=_non_negative_int, default=1000,
+                        help="Spacing between packets with --count, in microseconds (default: 1000)")
+    args = parser.parse_args()
+    VERBOSE = args.verbose
     
-    # First test connectivity
-    print(f"🔍 Testing connectivity to {ball_ip}...")
+    # Resolve once; every send below then reuses the resolved sockaddr
     try:
-        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        sock.settimeout(1.0)
-        # Send a simple ping-like packet
-        sock.sendto(b"ping", (ball_ip, 41412))
-        print("✅ Basic UDP connectivity works")
-        sock.close()
-    except Exception as e:
-        print(f"⚠️  Basic connectivity test failed: {e}")
-        print("   Continuing with color tests anyway...")
+        address = socket.getaddrinfo(args.ball_ip, args.port,
+                                     socket.AF_INET, socket.SOCK_DGRAM)[0][4]
+    except socket.gaierror as e:
+        print(f"❌ DNS/Address error: {e}")
+        sys.exit(1)
+    ball_ip, port = address
+    
+    if args.count is not None:
+        stream_packets(address, TEST_CASES[0][1], args.count, args.interval_us)
+        return
     
     # Test color commands
-    working_packet = test_ball_color(ball_ip)
+    working_packet = test_ball_color(ball_ip, port)
     
     if working_packet:
         print(f"\n🎉 Found working packet format!")
@@ -123,12 +248,7 @@ def main():
         print(f"Packet hex: {[hex(b) for b in working_packet]}")
     else:
         print(f"\n❌ No working packet format found")
-        print("Possible issues:")
-        print("- Ball is not powered on")
-        print("- Ball is not connected to network")
-        print("- Ball uses different port (not 41412)")
-        print("- Ball uses different packet format")
-        print("- Network firewall blocking UDP")
+        print_possible_issues(port)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,41 +1,129 @@
 #!/usr/bin/env python3
+import ctypes
+import ctypes.util
+import errno
+import os
+import platform
 import socket
 import struct
-import time
+
+# Socket tuning shared with test_ball_udp.py (kept inline so this script stands alone)
+SNDBUF_BYTES = 65536
+IPTOS_LOWDELAY = 0x10
+
+def _tune_socket(sock):
+    """Set SO_SNDBUF, IP_TOS and, on Linux, SO_PRIORITY"""
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SNDBUF_BYTES)
+    sock.setsockopt(socket.IPPROTO_IP, socket.IP_TOS, IPTOS_LOWDELAY)
+    if hasattr(socket, "SO_PRIORITY"):
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_PRIORITY, 6)
+
+class _IoVec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p), ("iov_len", ctypes.c_size_t)]
+
+class _MsgHdr(ctypes.Structure):
+    _fields_ = [("msg_name", ctypes.c_void_p), ("msg_namelen", ctypes.c_uint32),
+                ("msg_iov", ctypes.POINTER(_IoVec)), ("msg_iovlen", ctypes.c_size_t),
+                ("msg_control", ctypes.c_void_p), ("msg_controllen", ctypes.c_size_t),
+                ("msg_flags", ctypes.c_int)]
+
+class _MMsgHdr(ctypes.Structure):
+    _fields_ = [("msg_hdr", _MsgHdr), ("msg_len", ctypes.c_uint)]
+
+# sendmmsg(2) is Linux-only; elsewhere the packets go out one send() at a time
+_sendmmsg = None
+if platform.system() == "Linux":
+    _libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+    _sendmmsg = getattr(_libc, "sendmmsg", None)
+    if _sendmmsg is not None:
+        _sendmmsg.argtypes = [ctypes.c_int, ctypes.POINTER(_MMsgHdr), ctypes.c_uint, ctypes.c_int]
+        _sendmmsg.restype = ctypes.c_int
+
+def _send_retrying(sock, packet):
+    """send() on the connected socket; returns False if the peer's port refused a datagram
+
+    A connected UDP socket reports an earlier datagram's ICMP port-unreachable
+    as ConnectionRefusedError on the next send, and that packet is not sent,
+    so it is retried once.
+    """
+    try:
+        sock.send(packet)
+        return True
+    except ConnectionRefusedError:
+        try:
+            sock.send(packet)
+        except ConnectionRefusedError:
+            pass
+        return False
+
+def _sendmmsg_all(sock, packets):
+    """Send each packet as its own datagram to the connected peer, in one syscall where possible
+
+    Raises ConnectionRefusedError if the peer's port refused any of them.
+    """
+    refused = False
+    if _sendmmsg is None:
+        for packet in packets:
+            refused |= not _send_retrying(sock, packet)
+        if refused:
+            raise ConnectionRefusedError(errno.ECONNREFUSED, "port unreachable (nothing listening?)")
+        return
+    
+    buffers = [ctypes.create_string_buffer(packet, len(packet)) for packet in packets]
+    iovecs = (_IoVec * len(packets))(*[_IoVec(ctypes.cast(buf, ctypes.c_void_p), len(buf))
+                                       for buf in buffers])
+    msgs = (_MMsgHdr * len(packets))()
+    for i, msg in enumerate(msgs):
+        # msg_name stays NULL: the socket is connected
+        msg.msg_hdr.msg_iov = ctypes.pointer(iovecs[i])
+        msg.msg_hdr.msg_iovlen = 1
+    
+    sent = _sendmmsg(sock.fileno(), msgs, len(packets), 0)
+    if sent < 0:
+        err = ctypes.get_errno()
+        if err != errno.ECONNREFUSED:
+            raise OSError(err, os.strerror(err))
+        # Nothing went out; the loop below retries each packet
+        refused, sent = True, 0
+    # A short count means the kernel stopped early; send the rest individually
+    for packet in packets[sent:]:
+        refused |= not _send_retrying(sock, packet)
+    if refused:
+        raise ConnectionRefusedError(errno.ECONNREFUSED, "port unreachable (nothing listening?)")
+
+# Packets are fixed, so build them once: header byte(66), uint32(0), byte(0), uint16(0)
+# followed by the command (like the C++ code does)
+_HEADER = struct.pack("!bIBH", 66, 0, 0, 0)
+BRIGHTNESS_PACKET = _HEADER + struct.pack("!BB", 0x10, 7)  # brightness command, max brightness
+BLUE_PACKET = _HEADER + struct.pack("!BBBB", 0x0a, 0, 0, 255)  # Blue: R=0, G=0, B=255
 
 def send_blue_to_ball(ball_ip):
     """Send blue color command to a specific ball"""
     port = 41412
     
-    # Create socket
-    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    
     try:
-        # First send brightness command (like the C++ code does)
-        brightness_header = struct.pack("!bIBH", 66, 0, 0, 0)
-        brightness_data = struct.pack("!BB", 0x10, 7)  # brightness command, max brightness
-        brightness_packet = brightness_header + brightness_data
-        
-        print(f"Sending brightness command to {ball_ip}:{port}")
-        sock.sendto(brightness_packet, (ball_ip, port))
-        
-        # Small delay between commands
-        time.sleep(0.1)
-        
-        # Then send blue color command
-        color_header = struct.pack("!bIBH", 66, 0, 0, 0)
-        color_data = struct.pack("!BBBB", 0x0a, 0, 0, 255)  # Blue: R=0, G=0, B=255
-        color_packet = color_header + color_data
-        
-        print(f"Sending blue color command to {ball_ip}:{port}")
-        sock.sendto(color_packet, (ball_ip, port))
+        # The socket closes when the block exits, error or not
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            # Two tiny datagrams never fill the send buffer, so sends need no timeout
+            sock.setblocking(False)
+            _tune_socket(sock)
+            # Connecting fixes the peer once, so the sends below skip the per-packet route lookup
+            sock.connect((ball_ip, port))
+            
+            # Brightness first, then the blue color command, as separate datagrams
+            # handed to the kernel in one batch with no delay between them (the
+            # engine's UdpBallColorModule sends without a gap too). Each command
+            # carries its own header, so they are not concatenated (and sendmsg()
+            # with two buffers would still build a single datagram).
+            print(f"Sending brightness and blue color commands to {ball_ip}:{port}")
+            _sendmmsg_all(sock, [BRIGHTNESS_PACKET, BLUE_PACKET])
         
         print(f"Successfully sent blue color command to ball at {ball_ip}")
         
+    except ConnectionRefusedError:
+        print(f"Port unreachable at {ball_ip}:{port} - the ball rejected a command (nothing listening?)")
     except Exception as e:
         print(f"Error sending command to {ball_ip}: {e}")
-    finally:
-        sock.close()
 
 if __name__ == "__main__":
     # Send blue color to the specific ball